@@ -0,0 +1,292 @@
+import os
+import sys
+import json
+import uuid
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Optional
+
+# Add project root to sys.path to resolve core and utils modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import FastAPI, HTTPException, Query
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field, field_validator, model_validator
+from starlette.concurrency import iterate_in_threadpool, run_in_threadpool
+
+from core.vector_store import MedicalVectorStore
+from core.agent import (
+    ClinicalAssistant,
+    astream_turn,
+    date_range_error,
+    event_type_error,
+    stream_turn,
+)
+from core.checkpoint import BoundedMemorySaver
+from core.patient_registry import PatientRegistry
+from core.context import TurnTokens, compact_identity
+from core.router import QueryRouter
+from core import telemetry
+
+
+class ConcurrencyLimiter:
+    """
+    Caps the searches and chat turns a worker runs at once. A request waits up
+    to `queue_timeout` seconds for a free slot and is then rejected with 503
+    and Retry-After, so overload sheds load instead of piling up latency.
+    """
+
+    def __init__(self, limit, queue_timeout):
+        self.limit = limit
+        self.queue_timeout = queue_timeout
+        self._semaphore = asyncio.Semaphore(limit)
+
+    async def acquire(self):
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            telemetry.count("api_rejected_requests")
+            raise HTTPException(
+                status_code=503,
+                detail="Server busy, retry later.",
+                headers={"Retry-After": "1"},
+            )
+
+    def release(self):
+        self._semaphore.release()
+
+
+class LimitedStreamingResponse(StreamingResponse):
+    """Streaming response that releases a limiter slot when it is done."""
+
+    def __init__(self, content, limiter, **kwargs):
+        super().__init__(content, **kwargs)
+        self.limiter = limiter
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.limiter.release()
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # One pooled store, agent cache and router per worker process
+    vector_store = MedicalVectorStore()
+    app.state.vector_store = vector_store
+    app.state.assistant = ClinicalAssistant(vector_store)
+    app.state.router = QueryRouter(vector_store)
+    app.state.registry = PatientRegistry("data")
+    app.state.limiter = ConcurrencyLimiter(
+        int(os.getenv("API_MAX_CONCURRENCY", "16")),
+        float(os.getenv("API_QUEUE_TIMEOUT_SECONDS", "2")),
+    )
+    yield
+
+
+app = FastAPI(title="Clinical Assistant API", lifespan=lifespan)
+
+
+class SearchRequest(BaseModel):
+    query: str = Field(
+        default="", description="Search query; may be empty with order_by_date"
+    )
+    event_type: Optional[str] = Field(default=None, description="'visit' or 'lab'")
+    limit: int = Field(default=5, ge=1, le=50)
+    order_by_date: bool = False
+    date_from: Optional[str] = None
+    date_to: Optional[str] = None
+
+    # Same checks as the agent's search tool, so bad filters are a 422 here
+    # instead of an empty result or a backend error
+    @field_validator("event_type")
+    @classmethod
+    def check_event_type(cls, value):
+        error = value is not None and event_type_error(value)
+        if error:
+            raise ValueError(error)
+        return value
+
+    @model_validator(mode="after")
+    def check_dates(self):
+        error = date_range_error(self.date_from, self.date_to)
+        if error:
+            raise ValueError(error)
+        return self
+
+    @model_validator(mode="after")
+    def check_query(self):
+        # Only a plain newest-first lookup needs no query; an empty one would
+        # be embedded and return arbitrary neighbours
+        if not self.query.strip() and not self.order_by_date:
+            raise ValueError("query is required unless order_by_date is set")
+        return self
+
+
+class ChatRequest(BaseModel):
+    message: str
+    thread_id: Optional[str] = Field(
+        default=None, description="Conversation to continue; a new one if omitted"
+    )
+
+
+def load_patient(patient_id):
+    registry = app.state.registry
+    registry.refresh()
+    patient = registry.load(patient_id)
+    if patient is None:
+        raise HTTPException(status_code=404, detail=f"Unknown patient '{patient_id}'")
+    return patient
+
+
+def sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@app.get("/health")
+async def health():
+    return {"status": "ok"}
+
+
+# Registry and executor lookups block (file reads, agent construction), so
+# the handlers that only do those are plain `def` and run in the threadpool
+@app.get("/patients")
+def list_patients(
+    q: str = "", offset: int = Query(0, ge=0), limit: int = Query(50, ge=1, le=500)
+):
+    registry = app.state.registry
+    registry.refresh()
+    patients, total = registry.search(q, offset=offset, limit=limit)
+    return {"total": total, "patients": patients}
+
+
+@app.get("/patients/{patient_id}")
+def get_patient(patient_id: str):
+    return load_patient(patient_id)
+
+
+@app.post("/patients/{patient_id}/search")
+async def search(patient_id: str, request: SearchRequest):
+    limiter = app.state.limiter
+    await limiter.acquire()
+    try:
+        hits = await app.state.vector_store.asearch(
+            request.query, patient_id, **request.model_dump(exclude={"query"})
+        )
+    finally:
+        limiter.release()
+    return {
+        "results": [
+            {
+                "id": str(hit.id),
+                # Plain order_by_date lookups (empty query) are not scored
+                "score": getattr(hit, "score", None),
+                "payload": hit.payload,
+            }
+            for hit in hits
+        ]
+    }
+
+
+def _route(prompt, patient_id, medical_history, executor, config):
+    """Router fast path; routed turns are recorded in the agent's thread."""
+    routed = app.state.router.route(prompt, patient_id, medical_history)
+    if routed is not None:
+        app.state.assistant.record_turn(executor, config, prompt, routed["answer"])
+    return routed
+
+
+async def _turn_events(executor, prompt, config):
+    # The SQLite checkpointer is sync-only, so its turns run in the threadpool
+    if isinstance(app.state.assistant.checkpointer, BoundedMemorySaver):
+        async for event in astream_turn(executor, prompt, config):
+            yield event
+    else:
+        events = iterate_in_threadpool(stream_turn(executor, prompt, config))
+        async for event in events:
+            yield event
+
+
+@app.post("/patients/{patient_id}/chat")
+async def chat(patient_id: str, request: ChatRequest):
+    """
+    One chat turn as Server-Sent Events: `start` (thread_id), `token`,
+    `tool_call`, `tool_result` and a final `done` with the answer, token
+    counts and latency breakdown. Pass the thread_id back to continue.
+    """
+    patient = await run_in_threadpool(load_patient, patient_id)
+    medical_history = patient["medical_history"]
+    identity_context = compact_identity(patient["demographics"], medical_history)
+    thread_id = request.thread_id or str(uuid.uuid4())
+    config = {"configurable": {"thread_id": thread_id}}
+    executor = await run_in_threadpool(
+        app.state.assistant.get_executor, identity_context, patient_id
+    )
+
+    async def events():
+        yield sse("start", {"thread_id": thread_id})
+        answer = ""
+        routed = None
+        turn_tokens = TurnTokens()
+        with telemetry.start_trace("chat_turn") as trace:
+            routed = await run_in_threadpool(
+                _route,
+                request.message,
+                patient_id,
+                medical_history,
+                executor,
+                config,
+            )
+            if routed is not None:
+                answer = routed["answer"]
+            else:
+                async for event in _turn_events(executor, request.message, config):
+                    if event["type"] == "ai_message":
+                        turn_tokens.add_message(event["message"])
+                        if not event["message"].tool_calls:
+                            answer = event["message"].content
+                        continue
+                    if event["type"] == "tool_result":
+                        turn_tokens.add_tool_output(event["content"])
+                    data = {k: v for k, v in event.items() if k != "type"}
+                    yield sse(event["type"], data)
+                telemetry.count("input_tokens", turn_tokens.input_tokens)
+                telemetry.count("output_tokens", turn_tokens.output_tokens)
+        yield sse(
+            "done",
+            {
+                "thread_id": thread_id,
+                "answer": answer,
+                "routed_intent": routed["intent"] if routed else None,
+                "tokens": turn_tokens.as_dict(),
+                "trace": trace.as_dict(),
+            },
+        )
+
+    # Nothing awaits between taking the slot and returning the response, which
+    # gives it back once streaming ends, even if the stream never started
+    await app.state.limiter.acquire()
+    return LimitedStreamingResponse(
+        events(),
+        app.state.limiter,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus metrics of this worker process."""
+    return telemetry.metrics.render_prometheus()
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(
+        "api.main:app",
+        host=os.getenv("API_HOST", "0.0.0.0"),
+        port=int(os.getenv("API_PORT", "8000")),
+        workers=int(os.getenv("API_WORKERS", "1")),
+    )
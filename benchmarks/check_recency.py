@@ -0,0 +1,92 @@
+"""
+Regression check for date-ordered search (`order_by_date=True`) on every
+backend: a patient with two HbA1c labs and ten newer hemograms must get the
+HbA1c labs, newest first, for "HbA1c" rather than their newest records.
+Runs offline (Qdrant ':memory:', hashing embedder); exits non-zero on failure.
+"""
+
+import os
+import sys
+import asyncio
+import tempfile
+
+# Add project root to sys.path to resolve core and benchmarks modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fakes import FakeAsyncVoyageClient, FakeVoyageClient
+from benchmarks.run_benchmarks import isolate_environment
+from core.vector_store import MedicalVectorStore
+
+PATIENT_ID = "R0000001"
+
+
+def lab_chunk(lab_id, date, test, results):
+    return {
+        "text": f"DATE: {date} | TEST: {test} | RESULTS: {results}",
+        "metadata": {
+            "patient_id": PATIENT_ID,
+            "event_type": "lab",
+            "timestamp": f"{date}T00:00:00",
+        },
+        "internal_id": lab_id,
+    }
+
+
+def mixed_labs():
+    chunks = [
+        lab_chunk("hba1c-1", "2023-01-10", "HbA1c", "HbA1c: 7.9 %"),
+        lab_chunk("hba1c-2", "2024-01-10", "HbA1c", "HbA1c: 7.2 %"),
+    ]
+    for month in range(2, 12):
+        chunks.append(
+            lab_chunk(
+                f"cbc-{month}",
+                f"2024-{month:02d}-10",
+                "Hemograma",
+                "Hemoglobina: 13.8 g/dL, Leucocitos: 6.1 10^3/uL",
+            )
+        )
+    return chunks
+
+
+def dates(hits):
+    return [hit.payload["timestamp"][:10] for hit in hits]
+
+
+def check_backend(backend):
+    isolate_environment(tempfile.mkdtemp(prefix="recency-"), backend)
+    vs = MedicalVectorStore(
+        voyage_client=FakeVoyageClient(), async_voyage_client=FakeAsyncVoyageClient()
+    )
+    vs.upsert_chunks(mixed_labs())
+
+    search = dict(query="HbA1c", patient_id=PATIENT_ID, event_type="lab", limit=5)
+    expected = ["2024-01-10", "2023-01-10"]
+    results = {
+        "search": dates(vs.search(order_by_date=True, **search)),
+        "search_many": dates(vs.search_many([{**search, "order_by_date": True}])[0]),
+        "asearch": dates(asyncio.run(vs.asearch(order_by_date=True, **search))),
+    }
+    # A query whose terms match nothing still gets its nearest records
+    fallback = vs.search(
+        "zzzz", PATIENT_ID, event_type="lab", limit=3, order_by_date=True
+    )
+
+    failed = False
+    for path, got in results.items():
+        ok = got == expected
+        failed |= not ok
+        print(f"{'✅' if ok else '❌'} {backend} {path}: {got} (expected {expected})")
+    ok = len(fallback) == 3 and dates(fallback) == sorted(dates(fallback), reverse=True)
+    failed |= not ok
+    print(f"{'✅' if ok else '❌'} {backend} no-match fallback: {dates(fallback)}")
+    return not failed
+
+
+def main():
+    passed = [check_backend(backend) for backend in ("qdrant", "local")]
+    sys.exit(0 if all(passed) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Offline stand-ins for the network services used by the assistant: a
+deterministic embedder with Voyage's `embed` interface and a chat model that
+replays a scripted tool-calling turn.
+"""
+
+import asyncio
+import hashlib
+import json
+import time
+from typing import Any, List, Optional
+
+import numpy as np
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from core.lexical import tokenize
+
+
+class EmbeddingsResult:
+    def __init__(self, embeddings, total_tokens):
+        self.embeddings = embeddings
+        self.total_tokens = total_tokens
+
+
+def _bucket(token, dimension):
+    digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+    value = int.from_bytes(digest, "little")
+    return value % dimension, 1.0 if value >> 63 else -1.0
+
+
+class FakeVoyageClient:
+    """
+    Deterministic signed feature-hashing embedder (token unigrams, unit norm),
+    so texts sharing words land close together. `latency_ms` simulates the
+    round trip of a real embedding call.
+    """
+
+    def __init__(self, latency_ms=0.0):
+        self.latency = latency_ms / 1000
+        self.calls = 0
+
+    def _embed(self, texts, output_dimension):
+        self.calls += 1
+        vectors = np.zeros((len(texts), output_dimension), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token in tokenize(text) or [text]:
+                index, sign = _bucket(token, output_dimension)
+                vectors[row, index] += sign
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors /= np.where(norms == 0, 1, norms)
+        tokens = sum(len(text.split()) for text in texts)
+        return EmbeddingsResult(vectors.tolist(), tokens)
+
+    def embed(self, texts, model=None, input_type=None, output_dimension=512, **kwargs):
+        if self.latency:
+            time.sleep(self.latency)
+        return self._embed(texts, output_dimension)
+
+
+class FakeAsyncVoyageClient(FakeVoyageClient):
+    async def embed(self, texts, model=None, input_type=None, output_dimension=512, **kwargs):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self._embed(texts, output_dimension)
+
+
+class ScriptedChatModel(BaseChatModel):
+    """
+    Chat model that replays one tool-calling turn without a network call.
+
+    When the last message is the user's question it requests `tool_calls`
+    (each `{"name", "args"}`; a missing "query" arg is filled with the
+    question). Once tool results are in, it answers with a short text that
+    quotes the beginning of each observation. `latency_ms` is added per call.
+    """
+
+    tool_calls: List[dict]
+    latency_ms: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _next_message(self, messages):
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        last = messages[-1]
+        if isinstance(last, HumanMessage):
+            calls = []
+            for i, call in enumerate(self.tool_calls):
+                args = dict(call["args"])
+                args.setdefault("query", last.content)
+                calls.append({"name": call["name"], "args": args, "id": f"call_{i}"})
+            return AIMessage(content="", tool_calls=calls)
+
+        observations = []
+        for message in reversed(messages):
+            if not isinstance(message, ToolMessage):
+                break
+            observations.append(str(message.content)[:80].replace("\n", " "))
+        return AIMessage(content="Based on the records: " + " / ".join(observations))
+
+    def _generate(
+        self, messages, stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any
+    ) -> ChatResult:
+        return ChatResult(generations=[ChatGeneration(message=self._next_message(messages))])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        message = self._next_message(messages)
+        if message.tool_calls:
+            yield ChatGenerationChunk(
+                message=AIMessageChunk(
+                    content="",
+                    tool_call_chunks=[
+                        {
+                            "name": call["name"],
+                            "args": json.dumps(call["args"]),
+                            "id": call["id"],
+                            "index": i,
+                        }
+                        for i, call in enumerate(message.tool_calls)
+                    ],
+                )
+            )
+            return
+        for word in message.content.split(" "):
+            yield ChatGenerationChunk(message=AIMessageChunk(content=word + " "))
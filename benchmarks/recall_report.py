@@ -0,0 +1,209 @@
+"""
+Recall vs latency of the Qdrant storage profiles (float32 / int8 / binary).
+
+Every profile gets its own temporary collection holding the same synthetic
+corpus; patient-filtered dense searches are compared against exact
+(brute-force, full-precision) search on the same collection. Point
+QDRANT_URL at a real Qdrant server: the in-process ':memory:' mode ignores
+quantization and HNSW, so every profile would report perfect recall there.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+from datetime import datetime
+
+# Add project root to sys.path to resolve core, utils and benchmarks modules
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from dotenv import load_dotenv
+from qdrant_client.http import models
+
+from benchmarks.fakes import FakeVoyageClient
+from benchmarks.run_benchmarks import SEARCHES, git_revision, latency_summary
+from core.backends.qdrant_backend import QdrantBackend, build_filter
+from core.backends.qdrant_profiles import PROFILES
+from core.vector_store import MedicalVectorStore
+from utils.narrative import patient_to_chunks
+from utils.synthetic import iter_synthetic_patients
+
+load_dotenv()
+
+EXACT = models.SearchParams(exact=True)
+
+
+def wait_until_indexed(backend, timeout=600):
+    """Block until Qdrant has finished building indexes and quantized vectors."""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        info = backend.client.get_collection(backend.collection_name)
+        if info.status == models.CollectionStatus.GREEN:
+            return info
+        time.sleep(1)
+    raise TimeoutError(f"'{backend.collection_name}' still optimizing after {timeout}s")
+
+
+def build_collection(profile, args, embedder):
+    backend = QdrantBackend(
+        f"recall_{profile.name}",
+        os.getenv("EMBEDDING_MODEL", "voyage-3.5"),
+        int(os.getenv("EMBEDDING_DIM", "512")),
+        url=os.getenv("QDRANT_URL", "http://localhost:6333"),
+        profile=profile.name,
+    )
+    if backend.get_live_collection() is not None:
+        backend.swap_alias(backend.create_shadow_collection())
+    vs = MedicalVectorStore(backend=backend, voyage_client=embedder)
+
+    visits = args.events // 2
+    patients = iter_synthetic_patients(
+        args.patients, visits, args.events - visits, args.note_words, args.seed
+    )
+    stats = vs.upsert_chunks(
+        chunk for patient in patients for chunk in patient_to_chunks(patient)
+    )
+    info = wait_until_indexed(backend)
+    return vs, backend, stats, info.points_count
+
+
+def timed_query(backend, vector, query_filter, limit, params):
+    started = time.perf_counter()
+    points = backend.client.query_points(
+        collection_name=backend.collection_name,
+        query=vector,
+        query_filter=query_filter,
+        limit=limit,
+        search_params=params,
+    ).points
+    return [point.id for point in points], time.perf_counter() - started
+
+
+def measure(vs, backend, queries, args):
+    """Recall@k and latency for each oversampling factor, plus exact search."""
+    oversamplings = [None]
+    if backend.profile.quantization is not None:
+        oversamplings = [float(value) for value in args.oversampling.split(",")]
+
+    truth, exact_samples = [], []
+    for text, patient_id in queries:
+        vector = vs.embed_query(text)
+        query_filter = build_filter(patient_id)
+        ids, seconds = timed_query(backend, vector, query_filter, args.k, EXACT)
+        truth.append((vector, query_filter, set(ids)))
+        exact_samples.append(seconds)
+
+    rows = []
+    for oversampling in oversamplings:
+        params = backend.profile.search_params(oversampling=oversampling)
+        recalls, samples = [], []
+        for vector, query_filter, expected in truth:
+            ids, seconds = timed_query(backend, vector, query_filter, args.k, params)
+            samples.append(seconds)
+            if expected:
+                recalls.append(len(expected.intersection(ids)) / len(expected))
+        rows.append(
+            {
+                "oversampling": oversampling or backend.profile.oversampling,
+                "recall_at_k": round(sum(recalls) / max(1, len(recalls)), 4),
+                "latency": latency_summary(samples),
+            }
+        )
+    return {"exact_latency": latency_summary(exact_samples), "approximate": rows}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Recall@k vs latency of the Qdrant storage profiles."
+    )
+    parser.add_argument("--profiles", default=",".join(PROFILES))
+    parser.add_argument("--patients", type=int, default=100)
+    parser.add_argument("--events", type=int, default=200, help="Events per patient.")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument(
+        "--oversampling",
+        default="1,2,4",
+        help="Comma-separated oversampling factors for quantized profiles.",
+    )
+    parser.add_argument("--note-words", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--voyage",
+        action="store_true",
+        help="Embed with the real Voyage API instead of the offline hashing embedder.",
+    )
+    parser.add_argument(
+        "--keep", action="store_true", help="Keep the temporary collections."
+    )
+    parser.add_argument(
+        "--output",
+        default=None,
+        help="Results file (default: benchmarks/results/recall-<timestamp>.json).",
+    )
+    args = parser.parse_args()
+
+    if not os.getenv("QDRANT_URL", "").startswith(("http://", "https://")):
+        print(
+            "⚠️ QDRANT_URL is not a Qdrant server; local mode does not quantize, "
+            "so recall will be 1.0 for every profile."
+        )
+
+    embedder = None if args.voyage else FakeVoyageClient()
+    rng = random.Random(args.seed)
+    queries = [
+        (rng.choice(SEARCHES)[0], f"S{rng.randrange(args.patients):07d}")
+        for _ in range(args.queries)
+    ]
+
+    results = []
+    for name in args.profiles.split(","):
+        profile = PROFILES[name]
+        print(f"⏱️ {name}: {args.patients} patients x {args.events} events...")
+        vs, backend, stats, points = build_collection(profile, args, embedder)
+        try:
+            result = {
+                "profile": name,
+                "points": points,
+                "ingest_chunks_per_sec": round(stats["chunks_per_sec"], 1),
+                "vector_ram_bytes": profile.ram_bytes(points, backend.embedding_dim),
+                "vector_ram_reduction": round(4.0 / profile.ram_bytes_per_dim, 1),
+                **measure(vs, backend, queries, args),
+            }
+        finally:
+            if not args.keep:
+                # Dropping the collection drops its alias too
+                backend.client.delete_collection(backend.get_live_collection())
+        results.append(result)
+        for row in result["approximate"]:
+            print(
+                f"   ↳ oversampling {row['oversampling']}: "
+                f"recall@{args.k} {row['recall_at_k']}, "
+                f"p50 {row['latency']['p50_ms']} ms / p95 {row['latency']['p95_ms']} ms "
+                f"(exact p50 {result['exact_latency']['p50_ms']} ms), "
+                f"~{result['vector_ram_bytes'] / 2**20:.1f} MiB vectors in RAM"
+            )
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "git_revision": git_revision(),
+            "qdrant_url": os.getenv("QDRANT_URL"),
+            "args": vars(args),
+        },
+        "results": results,
+    }
+    output = args.output or os.path.join(
+        ROOT, "benchmarks", "results", f"recall-{datetime.now():%Y%m%d-%H%M%S}.json"
+    )
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n✨ Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
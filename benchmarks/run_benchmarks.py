@@ -0,0 +1,257 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import subprocess
+import tempfile
+from datetime import datetime
+
+# Add project root to sys.path to resolve core, utils and benchmarks modules
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+import numpy as np
+
+from benchmarks.fakes import FakeAsyncVoyageClient, FakeVoyageClient, ScriptedChatModel
+from core.agent import ClinicalAssistant, stream_turn
+from core.context import compact_identity
+from core.vector_store import MedicalVectorStore
+from utils.narrative import patient_to_chunks
+from utils.synthetic import synthetic_patient
+
+SEARCHES = [
+    ("glucosa en ayunas elevada", "lab"),
+    ("ajuste de dosis de Losartán por presión alta", "visit"),
+    ("última visita por dolor torácico", "visit"),
+    ("hba1c", "lab"),
+    ("creatinina", "lab"),
+    ("crisis asmática tratada con salbutamol", "visit"),
+]
+
+AGENT_SCRIPT = [
+    {"name": "medical_search_tool", "args": {"event_type": "visit"}},
+    {"name": "medical_search_tool", "args": {"event_type": "lab"}},
+]
+
+
+def isolate_environment(workdir, backend):
+    """Point every store at a throwaway directory and turn result caches off."""
+    os.environ.update(
+        {
+            "VECTOR_BACKEND": backend,
+            "QDRANT_URL": ":memory:",
+            "LOCAL_VECTOR_PATH": os.path.join(workdir, "local_vectors"),
+            "LAB_STORE_PATH": os.path.join(workdir, "lab_store"),
+            "DATA_VERSIONS_PATH": os.path.join(workdir, "data_versions.sqlite"),
+            "CHECKPOINTER": "memory",
+            "QUERY_CACHE_SIZE": "0",
+            "QUERY_CACHE_PATH": "",
+            "TOOL_CACHE_SIZE": "0",
+            "SEARCH_BATCH_WINDOW_MS": "5",
+        }
+    )
+
+
+def latency_summary(samples):
+    ms = np.asarray(samples) * 1000
+    return {
+        "n": int(ms.size),
+        "mean_ms": round(float(ms.mean()), 3),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+    }
+
+
+def bench_ingest(vs, patients):
+    chunks = (chunk for patient in patients for chunk in patient_to_chunks(patient))
+    stats = vs.upsert_chunks(chunks)
+    return {
+        "chunks": stats["chunks"],
+        "seconds": round(stats["seconds"], 3),
+        "chunks_per_sec": round(stats["chunks_per_sec"], 1),
+    }
+
+
+def bench_search(vs, patient_ids, iterations, rng):
+    samples = []
+    for i in range(iterations):
+        query, event_type = SEARCHES[i % len(SEARCHES)]
+        patient_id = rng.choice(patient_ids)
+        started = time.perf_counter()
+        vs.search(query, patient_id, event_type=event_type)
+        samples.append(time.perf_counter() - started)
+    return latency_summary(samples)
+
+
+def bench_agent(vs, patients, turns, llm_latency_ms, rng):
+    assistant = ClinicalAssistant(
+        vs, llm=ScriptedChatModel(tool_calls=AGENT_SCRIPT, latency_ms=llm_latency_ms)
+    )
+    executor_samples, first_token, turn_samples = [], [], []
+    for i in range(turns):
+        patient = rng.choice(patients)
+        identity = compact_identity(patient["demographics"], patient["medical_history"])
+
+        started = time.perf_counter()
+        executor = assistant.get_executor(identity, patient["patient_id"])
+        executor_samples.append(time.perf_counter() - started)
+
+        config = {"configurable": {"thread_id": f"bench-{i}"}}
+        started = time.perf_counter()
+        first = None
+        for event in stream_turn(executor, "¿Cómo ha evolucionado la glucosa?", config):
+            if event["type"] == "token" and first is None:
+                first = time.perf_counter() - started
+        turn_samples.append(time.perf_counter() - started)
+        first_token.append(first if first is not None else turn_samples[-1])
+
+    return {
+        "get_executor": latency_summary(executor_samples),
+        "first_token": latency_summary(first_token),
+        "turn": latency_summary(turn_samples),
+    }
+
+
+def run_case(backend, events, args):
+    with tempfile.TemporaryDirectory(prefix="clinical-bench-") as workdir:
+        isolate_environment(workdir, backend)
+        vs = MedicalVectorStore(
+            voyage_client=FakeVoyageClient(args.embed_latency_ms),
+            async_voyage_client=FakeAsyncVoyageClient(args.embed_latency_ms),
+        )
+        visits = events // 2
+        patients = [
+            synthetic_patient(i, visits, events - visits, args.note_words, args.seed)
+            for i in range(args.patients)
+        ]
+        rng = random.Random(args.seed)
+
+        print(f"⏱️ {backend}: {args.patients} patients x {events} events...")
+        result = {
+            "backend": backend,
+            "patients": args.patients,
+            "events_per_patient": events,
+            "ingest": bench_ingest(vs, patients),
+            "search": bench_search(
+                vs, [p["patient_id"] for p in patients], args.searches, rng
+            ),
+            "agent": bench_agent(vs, patients, args.turns, args.llm_latency_ms, rng),
+        }
+        print(
+            f"   ↳ ingest {result['ingest']['chunks_per_sec']} chunks/sec, "
+            f"search p50 {result['search']['p50_ms']} ms / p95 {result['search']['p95_ms']} ms, "
+            f"turn p50 {result['agent']['turn']['p50_ms']} ms"
+        )
+        return result
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(baseline_path, results):
+    """Print p50/p95 deltas against a previous results file."""
+    with open(baseline_path) as f:
+        baseline = {
+            (r["backend"], r["events_per_patient"]): r for r in json.load(f)["results"]
+        }
+    print(f"\n📊 Compared with {baseline_path}:")
+    for result in results:
+        old = baseline.get((result["backend"], result["events_per_patient"]))
+        if old is None:
+            continue
+        for name, new_stats, old_stats in (
+            ("search", result["search"], old["search"]),
+            ("turn", result["agent"]["turn"], old["agent"]["turn"]),
+        ):
+            for key in ("p50_ms", "p95_ms"):
+                change = (
+                    (new_stats[key] - old_stats[key]) / old_stats[key]
+                    if old_stats[key]
+                    else 0.0
+                )
+                print(
+                    f"   {result['backend']:<6} {result['events_per_patient']:>6} events "
+                    f"{name:<6} {key}: {old_stats[key]} → {new_stats[key]} ({change:+.0%})"
+                )
+        old_rate = old["ingest"]["chunks_per_sec"]
+        new_rate = result["ingest"]["chunks_per_sec"]
+        print(
+            f"   {result['backend']:<6} {result['events_per_patient']:>6} events "
+            f"ingest chunks/sec: {old_rate} → {new_rate}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Offline benchmarks for ingestion, retrieval and the agent loop."
+    )
+    parser.add_argument(
+        "--backend",
+        choices=["qdrant", "local", "all"],
+        default="all",
+        help="Vector backend to benchmark (qdrant runs in-process with ':memory:').",
+    )
+    parser.add_argument(
+        "--events",
+        default="20,200,2000",
+        help="Comma-separated events per patient (one case per corpus size).",
+    )
+    parser.add_argument("--patients", type=int, default=10)
+    parser.add_argument("--searches", type=int, default=300)
+    parser.add_argument("--turns", type=int, default=20)
+    parser.add_argument("--embed-latency-ms", type=float, default=0.0)
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0)
+    parser.add_argument("--note-words", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--output",
+        default=None,
+        help="Results file (default: benchmarks/results/<timestamp>.json).",
+    )
+    parser.add_argument(
+        "--compare", default=None, help="Previous results file to diff against."
+    )
+    args = parser.parse_args()
+
+    backends = ["qdrant", "local"] if args.backend == "all" else [args.backend]
+    sizes = [int(value) for value in args.events.split(",")]
+    results = [run_case(backend, events, args) for backend in backends for events in sizes]
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "args": vars(args),
+        },
+        "results": results,
+    }
+    output = args.output or os.path.join(
+        ROOT, "benchmarks", "results", f"{datetime.now():%Y%m%d-%H%M%S}.json"
+    )
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n✨ Results written to {output}")
+
+    if args.compare:
+        compare(args.compare, results)
+
+
+if __name__ == "__main__":
+    main()
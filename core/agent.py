@@ -1,16 +1,52 @@
 from langchain.tools import BaseTool
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage, ToolMessage
 from typing import Optional, Type
 from pydantic import BaseModel, Field
 from core.vector_store import MedicalVectorStore
+from core.lab_store import LabStore
 from langchain_deepseek import ChatDeepSeek
 from langchain.agents import create_agent
-from langgraph.checkpoint.memory import MemorySaver
+from langchain.agents.middleware import (
+    AgentMiddleware,
+    ClearToolUsesEdit,
+    ContextEditingMiddleware,
+    ModelRequest,
+    SummarizationMiddleware,
+    dynamic_prompt,
+)
+from core.checkpoint import create_checkpointer
+from core.result_cache import DataVersions, ToolResultCache
+from core.context import assemble_search_context
+from core import telemetry
 import os
-from datetime import datetime
+import hashlib
+import time
+import asyncio
+import threading
+import contextvars
+from collections import OrderedDict
+from concurrent.futures import Future
+from datetime import datetime, date
 from dotenv import load_dotenv
 
 load_dotenv()
 
+# Prompt for folding older turns into the running summary. The previous
+# summary is one of the summarized messages, so it is carried forward.
+HISTORY_SUMMARY_PROMPT = """You are compacting the history of a clinical consultation about one patient.
+Merge any earlier summary with the messages below into a new, concise summary that preserves:
+- The clinician's questions and what is still being investigated
+- Every clinical fact found (values, diagnoses, medications, findings) WITH its source and exact date, e.g. "visita del 2024-10-15", "laboratorio del 2024-10-10"
+- Information that was searched for and not found
+
+Do not add anything that is not in the messages. Respond ONLY with the summary.
+
+<messages>
+{messages}
+</messages>"""
+# Stands in for tool outputs dropped from the prompt
+CLEARED_TOOL_RESULT = "[Earlier search result removed; search again if needed]"
+
 
 class MedicalSearchSchema(BaseModel):
     query: str = Field(description="Semantic search query for clinical history or labs")
@@ -19,6 +55,146 @@ class MedicalSearchSchema(BaseModel):
         default=False,
         description="Set to True for queries about 'most recent', 'latest', 'last' events to ensure chronological ordering",
     )
+    date_from: Optional[str] = Field(
+        default=None,
+        description="Optional inclusive start date (YYYY-MM-DD) for time-window queries like 'last 3 months'",
+    )
+    date_to: Optional[str] = Field(
+        default=None,
+        description="Optional inclusive end date (YYYY-MM-DD) for time-window queries",
+    )
+
+
+EVENT_TYPES = ("visit", "lab")
+
+
+def event_type_error(event_type):
+    """Why `event_type` is not a record type, or None if it is one."""
+    if event_type not in EVENT_TYPES:
+        return "event_type must be either 'visit' or 'lab'"
+    return None
+
+
+def date_range_error(date_from, date_to):
+    """Why the date bounds are not YYYY-MM-DD dates, or None if they are."""
+    for value in (date_from, date_to):
+        if value:
+            try:
+                date.fromisoformat(value)
+            except ValueError:
+                return "date_from/date_to must be dates in YYYY-MM-DD format"
+    return None
+
+
+# medical_search_tool calls in the model step being executed, set per tool
+# call by SearchBatchMiddleware; None when unknown (the batcher then waits)
+_step_searches = contextvars.ContextVar("step_searches", default=None)
+
+
+class SearchBatcher:
+    """
+    Coalesces searches that arrive together into one `search_many` call.
+
+    When the agent emits several medical_search_tool calls in one turn, the
+    tool node runs them concurrently; the first call waits `window` seconds
+    for its siblings and then embeds and queries all of them in a single
+    round trip. A window of 0 disables batching.
+
+    The wait only pays off when siblings exist, so a call that
+    `SearchBatchMiddleware` reports as its step's only search runs at once
+    (or joins a batch already forming). Callers outside the agent give no
+    such hint and always wait, trading up to `window` of latency for the
+    chance to share a round trip.
+    """
+
+    def __init__(self, vector_store, window=None):
+        self.vector_store = vector_store
+        if window is None:
+            window = float(os.getenv("SEARCH_BATCH_WINDOW_MS", "5")) / 1000
+        self.window = window
+        self._lock = threading.Lock()
+        self._pending = []
+        self._async_pending = {}  # event loop -> pending (search, future) pairs
+        self._flush_tasks = set()  # strong references to running async batches
+
+    def _expects_siblings(self):
+        searches = _step_searches.get()
+        return searches is None or searches > 1
+
+    def search(self, **search):
+        if self.window <= 0:
+            return self.vector_store.search(**search)
+
+        future = Future()
+        with self._lock:
+            joined = bool(self._pending) or self._expects_siblings()
+            if joined:
+                self._pending.append((search, future))
+                is_leader = len(self._pending) == 1
+        if not joined:
+            return self.vector_store.search(**search)
+        if is_leader:
+            time.sleep(self.window)
+            with self._lock:
+                batch, self._pending = self._pending, []
+            self._resolve(batch, lambda: self.vector_store.search_many([s for s, _ in batch]))
+        return future.result()
+
+    async def asearch(self, **search):
+        if self.window <= 0:
+            return await self.vector_store.asearch(**search)
+
+        loop = asyncio.get_running_loop()
+        if loop not in self._async_pending and not self._expects_siblings():
+            return await self.vector_store.asearch(**search)
+        future = loop.create_future()
+        pending = self._async_pending.setdefault(loop, [])
+        pending.append((search, future))
+        if len(pending) == 1:
+            # The batch runs in its own task, so cancelling the first caller
+            # (e.g. a client disconnect) cannot strand the others
+            task = loop.create_task(self._aflush(loop))
+            self._flush_tasks.add(task)
+            task.add_done_callback(self._flush_tasks.discard)
+        return await future
+
+    async def _aflush(self, loop):
+        try:
+            await asyncio.sleep(self.window)
+        finally:
+            batch = self._async_pending.pop(loop, [])
+        # Callers cancelled while waiting are left out of the batch
+        batch = [(s, f) for s, f in batch if not f.done()]
+        if not batch:
+            return
+        try:
+            results = await self.vector_store.asearch_many([s for s, _ in batch])
+        except BaseException as e:
+            for _, f in batch:
+                if not f.done():
+                    if isinstance(e, asyncio.CancelledError):
+                        f.cancel()
+                    else:
+                        f.set_exception(e)
+            if not isinstance(e, Exception):
+                raise
+        else:
+            for (_, f), result in zip(batch, results):
+                if not f.done():
+                    f.set_result(result)
+
+    @staticmethod
+    def _resolve(batch, run):
+        try:
+            results = run()
+        except BaseException as e:
+            for _, future in batch:
+                future.set_exception(e)
+            if not isinstance(e, Exception):
+                raise
+        else:
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
 
 
 class MedicalSearchTool(BaseTool):
@@ -29,60 +205,250 @@ class MedicalSearchTool(BaseTool):
         "diagnoses, treatments, or historical medical data. "
         "DO NOT answer from memory - always search the actual records. "
         "IMPORTANT: You MUST specify event_type as either 'visit' or 'lab'. "
-        "For queries about 'most recent', 'latest', 'last' events, set order_by_date=True."
+        "For queries about 'most recent', 'latest', 'last' events, set order_by_date=True. "
+        "For time windows (e.g. 'last 3 months', 'in 2024'), set date_from/date_to as YYYY-MM-DD."
     )
     args_schema: Type[BaseModel] = MedicalSearchSchema
     vector_store: MedicalVectorStore = None
     patient_id: str = None  # Will be set when creating the tool
+    batcher: Optional[SearchBatcher] = None  # Coalesces parallel tool calls
+    cache: Optional[ToolResultCache] = None  # Formatted results per search
+    limit: int = 5
 
-    def __init__(self, vector_store, patient_id=None):
+    def __init__(self, vector_store, patient_id=None, batcher=None, cache=None):
         super().__init__()
         self.vector_store = vector_store
         self.patient_id = patient_id
+        self.batcher = batcher
+        self.cache = cache
 
-    def _run(self, query: str, event_type: str, order_by_date: bool = False):
+    def _validate(self, event_type, date_from, date_to):
+        """Return an error message for invalid arguments, or None."""
         if not self.patient_id:
             return "Error: Patient ID not set"
 
-        # Validate event_type
-        if event_type not in ["visit", "lab"]:
-            return "Error: event_type must be either 'visit' or 'lab'"
+        error = event_type_error(event_type) or date_range_error(date_from, date_to)
+        return f"Error: {error}" if error else None
 
-        results = self.vector_store.search(
-            query, self.patient_id, event_type=event_type, order_by_date=order_by_date
-        )
-        if not results:
-            return "No relevant records found for this query."
+    @staticmethod
+    def _format_results(results):
+        # De-duplicated, citation-preserving and trimmed to the token budget
+        return assemble_search_context(results)
 
-        formatted_results = []
-        for res in results:
-            event_type_str = res.payload.get("event_type", "record")
-            formatted_results.append(
-                f"Source: {event_type_str.capitalize()}\nDate: {res.payload['timestamp']}\nContent: {res.payload['text']}"
-            )
+    def _cached_output(self, search):
+        """(cached output or None, data version), counting cache hits and misses."""
+        if not self.cache:
+            return None, None
+        cached, version = self.cache.get(search)
+        if cached is None:
+            telemetry.count("tool_result_cache_misses")
+        else:
+            telemetry.count("tool_result_cache_hits")
+        return cached, version
 
-        return "\n\n---\n\n".join(formatted_results)
+    def _run(
+        self,
+        query: str,
+        event_type: str,
+        order_by_date: bool = False,
+        date_from: Optional[str] = None,
+        date_to: Optional[str] = None,
+    ):
+        error = self._validate(event_type, date_from, date_to)
+        if error:
+            return error
 
+        search = dict(
+            query=query,
+            patient_id=self.patient_id,
+            event_type=event_type,
+            order_by_date=order_by_date,
+            date_from=date_from,
+            date_to=date_to,
+            limit=self.limit,
+        )
+        telemetry.count("tool_calls", tool=self.name)
+        with telemetry.span("tool", tool=self.name):
+            cached, version = self._cached_output(search)
+            if cached is not None:
+                return cached
 
-class ClinicalAssistant:
-    def __init__(self, vector_store):
-        self.vector_store = vector_store
-        self.llm = ChatDeepSeek(
-            model="deepseek-chat",
-            api_key=os.getenv("DEEPSEEK_API_KEY"),
-            temperature=0,
+            if self.batcher:
+                results = self.batcher.search(**search)
+            else:
+                results = self.vector_store.search(**search)
+            output = self._format_results(results)
+            if self.cache:
+                self.cache.put(search, version, output)
+            return output
+
+    async def _arun(
+        self,
+        query: str,
+        event_type: str,
+        order_by_date: bool = False,
+        date_from: Optional[str] = None,
+        date_to: Optional[str] = None,
+    ):
+        error = self._validate(event_type, date_from, date_to)
+        if error:
+            return error
+
+        search = dict(
+            query=query,
+            patient_id=self.patient_id,
+            event_type=event_type,
+            order_by_date=order_by_date,
+            date_from=date_from,
+            date_to=date_to,
+            limit=self.limit,
         )
+        telemetry.count("tool_calls", tool=self.name)
+        with telemetry.span("tool", tool=self.name):
+            cached, version = self._cached_output(search)
+            if cached is not None:
+                return cached
 
-    def get_executor(self, identity_context, patient_id):
-        # Create tool with patient_id bound to it
-        tool = MedicalSearchTool(vector_store=self.vector_store, patient_id=patient_id)
-        tools = [tool]
+            if self.batcher:
+                results = await self.batcher.asearch(**search)
+            else:
+                results = await self.vector_store.asearch(**search)
+            output = self._format_results(results)
+            if self.cache:
+                self.cache.put(search, version, output)
+            return output
+
+
+class LabTrendSchema(BaseModel):
+    analyte: str = Field(
+        description="Lab analyte name as it appears in results, e.g. 'hba1c', 'glucose', 'creatinine'"
+    )
+    stat: str = Field(
+        default="series",
+        description="'series' for all values over time, 'latest' for the most recent value, or 'summary' for latest/min/max/change",
+    )
+    date_from: Optional[str] = Field(
+        default=None, description="Optional inclusive start date (YYYY-MM-DD)"
+    )
+    date_to: Optional[str] = Field(
+        default=None, description="Optional inclusive end date (YYYY-MM-DD)"
+    )
+
+
+class LabTrendTool(BaseTool):
+    name: str = "lab_trend_tool"
+    description: str = (
+        "Use for questions about how a numeric lab value evolved or its latest, minimum or maximum value "
+        "(e.g. 'how has HbA1c changed', 'last creatinine', 'highest glucose'). "
+        "Returns dated values directly from the structured lab results. "
+        "Use medical_search_tool instead for lab reports without a specific analyte."
+    )
+    args_schema: Type[BaseModel] = LabTrendSchema
+    lab_store: LabStore = None
+    patient_id: str = None  # Will be set when creating the tool
+
+    def __init__(self, lab_store, patient_id=None):
+        super().__init__()
+        self.lab_store = lab_store
+        self.patient_id = patient_id
+
+    @staticmethod
+    def _format_point(point):
+        return f"{point['date']}: {point['raw']} (Source: Lab - {point['test']})"
+
+    def _run(
+        self,
+        analyte: str,
+        stat: str = "series",
+        date_from: Optional[str] = None,
+        date_to: Optional[str] = None,
+    ):
+        telemetry.count("tool_calls", tool=self.name)
+        with telemetry.span("tool", tool=self.name):
+            return self._lookup(analyte, stat, date_from, date_to)
+
+    def _lookup(self, analyte, stat, date_from, date_to):
+        if not self.patient_id:
+            return "Error: Patient ID not set"
+
+        if stat not in ["series", "latest", "summary"]:
+            return "Error: stat must be 'series', 'latest' or 'summary'"
+
+        error = date_range_error(date_from, date_to)
+        if error:
+            return f"Error: {error}"
+
+        key = self.lab_store.resolve_analyte(self.patient_id, analyte)
+        if key is None:
+            available = ", ".join(self.lab_store.analytes(self.patient_id)) or "none"
+            return f"No lab series found for '{analyte}'. Available analytes: {available}"
+
+        if stat == "summary":
+            summary = self.lab_store.summary(self.patient_id, key, date_from, date_to)
+            if summary is None:
+                return f"No {key} results in the requested period."
+            lines = [f"Analyte: {key} ({summary['count']} results)"]
+            lines.append(f"Latest: {self._format_point(summary['latest'])}")
+            if "min" in summary:
+                unit = summary["latest"]["unit"]
+                lines.append(f"Min: {self._format_point(summary['min'])}")
+                lines.append(f"Max: {self._format_point(summary['max'])}")
+                lines.append(
+                    f"Change since {summary['first']['date']}: {summary['delta']:+g} {unit}".rstrip()
+                )
+            return "\n".join(lines)
+
+        points = self.lab_store.series(self.patient_id, key, date_from, date_to)
+        if not points:
+            return f"No {key} results in the requested period."
+        if stat == "latest":
+            points = points[-1:]
+        return f"Analyte: {key}\n" + "\n".join(self._format_point(p) for p in points)
+
+
+class SearchBatchMiddleware(AgentMiddleware):
+    """Tells the SearchBatcher how many searches the current model step made."""
 
-        # Get current datetime for relative time understanding
-        current_datetime = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    @staticmethod
+    def _step_searches(request):
+        messages = request.state.get("messages", []) if request.state else []
+        last = next((m for m in reversed(messages) if isinstance(m, AIMessage)), None)
+        if last is None:
+            return None
+        return sum(tc["name"] == "medical_search_tool" for tc in last.tool_calls)
 
-        # System prompt with instructions
-        system_prompt = f"""You are a professional clinical assistant with access to a patient's medical records database.
+    def wrap_tool_call(self, request, handler):
+        token = _step_searches.set(self._step_searches(request))
+        try:
+            return handler(request)
+        finally:
+            _step_searches.reset(token)
+
+    async def awrap_tool_call(self, request, handler):
+        token = _step_searches.set(self._step_searches(request))
+        try:
+            return await handler(request)
+        finally:
+            _step_searches.reset(token)
+
+
+class ModelTelemetryMiddleware(AgentMiddleware):
+    """Times every model call ("llm" span) and counts agent steps."""
+
+    def wrap_model_call(self, request, handler):
+        telemetry.count("model_calls")
+        with telemetry.span("llm"):
+            return handler(request)
+
+    async def awrap_model_call(self, request, handler):
+        telemetry.count("model_calls")
+        with telemetry.span("llm"):
+            return await handler(request)
+
+
+def build_system_prompt(identity_context, current_datetime):
+    """System prompt with the patient's identity context and the current date."""
+    return f"""You are a professional clinical assistant with access to a patient's medical records database.
 
 CURRENT DATE AND TIME: {current_datetime}
 (Use this for understanding relative time queries like "2 months ago", "last week", "recent", etc.)
@@ -92,9 +458,11 @@ Current Patient Identity Context (STATIC INFO ONLY):
 
 CRITICAL INSTRUCTIONS:
 1. The identity context above contains ONLY basic demographics, chronic conditions, allergies, and current medications.
-2. For ANY question about visit history, lab results, doctor notes, symptoms, diagnoses, or past events, you MUST use the medical_search_tool.
+2. For ANY question about visit history, lab results, doctor notes, symptoms, diagnoses, or past events, you MUST use the medical_search_tool (or lab_trend_tool for numeric lab trends).
 3. When using medical_search_tool, you MUST specify event_type as either 'visit' or 'lab'.
 4. For queries about "most recent", "latest", "last" events, set order_by_date=True to ensure chronological ordering.
+   For time windows ("last 3 months", "since January"), compute date_from/date_to (YYYY-MM-DD) from the current date.
+   For the evolution, latest, min or max of a specific lab value (HbA1c, glucose, creatinine...), prefer lab_trend_tool.
 5. NEVER make up, invent, or hallucinate medical data. Only report information you have explicitly found.
 6. If you cannot find the requested information after searching, you MUST say "No encontré esa información en los registros disponibles" - DO NOT guess or make up an answer.
 7. Always cite the exact date and source of information (e.g., "Según visita del 2024-10-15...").
@@ -104,7 +472,190 @@ CRITICAL INSTRUCTIONS:
 
 Remember: Visit notes and lab results are NOT in the identity context - you must search for them!"""
 
-        checkpointer = MemorySaver()
-        agent = create_agent(self.llm, tools, system_prompt=system_prompt, checkpointer=checkpointer )
 
+class ClinicalAssistant:
+    def __init__(self, vector_store, lab_store=None, llm=None):
+        self.vector_store = vector_store
+        self.lab_store = lab_store or LabStore()
+        # One checkpointer (bounded, optionally SQLite) shared by every agent
+        self.checkpointer = create_checkpointer()
+        self.max_cached_agents = int(os.getenv("AGENT_CACHE_SIZE", "64"))
+        self._executors = OrderedDict()
+        self._executors_lock = threading.Lock()
+        self.search_batcher = SearchBatcher(vector_store)
+        # Repeated searches are served from here until ingestion bumps the
+        # patient's data version or the TTL expires
+        self.result_cache = ToolResultCache(
+            DataVersions(),
+            max_entries=int(os.getenv("TOOL_CACHE_SIZE", "512")),
+            ttl_seconds=float(os.getenv("TOOL_CACHE_TTL_SECONDS", "900")),
+        )
+        self.llm = llm or ChatDeepSeek(
+            model="deepseek-chat",
+            api_key=os.getenv("DEEPSEEK_API_KEY"),
+            temperature=0,
+            stream_usage=True,  # token usage on streamed turns
+        )
+
+    def get_executor(self, identity_context, patient_id):
+        """
+        Compiled agent for a patient, cached per (patient_id, identity context)
+        with LRU eviction. All agents share one checkpointer, so a `thread_id`
+        keeps its conversation across turns.
+        """
+        key = (patient_id, hashlib.sha256(identity_context.encode("utf-8")).hexdigest())
+        with self._executors_lock:
+            agent = self._executors.get(key)
+            if agent is not None:
+                self._executors.move_to_end(key)
+                return agent
+
+        agent = self._build_executor(identity_context, patient_id)
+        with self._executors_lock:
+            self._executors[key] = agent
+            while len(self._executors) > self.max_cached_agents:
+                self._executors.popitem(last=False)
         return agent
+
+    def record_turn(self, executor, config, prompt, answer):
+        """
+        Append a turn answered outside the agent (e.g. by the QueryRouter) to
+        the thread's conversation, so follow-up questions can refer to it.
+        """
+        messages = [HumanMessage(content=prompt), AIMessage(content=answer)]
+        executor.update_state(config, {"messages": messages})
+
+    def _history_middleware(self):
+        """
+        Keep prompt size roughly constant over a long consultation: once the
+        thread exceeds HISTORY_SUMMARY_TRIGGER_TOKENS, everything but the last
+        HISTORY_KEEP_MESSAGES messages is folded into a running summary (which
+        replaces them in the checkpointed thread), and older tool outputs are
+        dropped from the prompt beyond HISTORY_TOOL_CLEAR_TOKENS.
+        """
+        return [
+            SummarizationMiddleware(
+                self.llm,
+                trigger=(
+                    "tokens",
+                    int(os.getenv("HISTORY_SUMMARY_TRIGGER_TOKENS", "6000")),
+                ),
+                keep=("messages", int(os.getenv("HISTORY_KEEP_MESSAGES", "10"))),
+                summary_prompt=HISTORY_SUMMARY_PROMPT,
+            ),
+            ContextEditingMiddleware(
+                edits=[
+                    ClearToolUsesEdit(
+                        trigger=int(os.getenv("HISTORY_TOOL_CLEAR_TOKENS", "3000")),
+                        keep=int(os.getenv("HISTORY_KEEP_TOOL_RESULTS", "3")),
+                        placeholder=CLEARED_TOOL_RESULT,
+                    )
+                ]
+            ),
+        ]
+
+    def _build_executor(self, identity_context, patient_id):
+        # Create tool with patient_id bound to it
+        tool = MedicalSearchTool(
+            vector_store=self.vector_store,
+            patient_id=patient_id,
+            batcher=self.search_batcher,
+            cache=self.result_cache,
+        )
+        tools = [tool, LabTrendTool(lab_store=self.lab_store, patient_id=patient_id)]
+
+        # The current datetime (for relative time queries) is injected on every
+        # model call rather than baked in when the agent is compiled.
+        @dynamic_prompt
+        def system_prompt(request: ModelRequest) -> str:
+            current_datetime = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            return build_system_prompt(identity_context, current_datetime)
+
+        return create_agent(
+            self.llm,
+            tools,
+            middleware=[
+                system_prompt,
+                *self._history_middleware(),
+                SearchBatchMiddleware(),
+                ModelTelemetryMiddleware(),
+            ],
+            checkpointer=self.checkpointer,
+        )
+
+
+def _message_text(content):
+    """Text of a message/chunk content that may be a string or content blocks."""
+    if isinstance(content, str):
+        return content
+    return "".join(
+        part.get("text", "") for part in content if isinstance(part, dict)
+    )
+
+
+def _turn_events(mode, payload):
+    """Translate one (stream_mode, payload) pair into UI-level turn events."""
+    if mode == "messages":
+        chunk, metadata = payload
+        if metadata.get("langgraph_node") == "model" and isinstance(
+            chunk, AIMessageChunk
+        ):
+            text = _message_text(chunk.content)
+            if text:
+                yield {"type": "token", "text": text}
+        return
+
+    for node, update in payload.items():
+        # Middleware nodes (e.g. history summarization) rewrite earlier
+        # messages; only the model and tool nodes produce this turn's events
+        if node not in ("model", "tools") or not isinstance(update, dict):
+            continue
+        for message in update.get("messages", []):
+            if isinstance(message, AIMessage):
+                for tc in message.tool_calls:
+                    yield {
+                        "type": "tool_call",
+                        "id": tc.get("id"),
+                        "name": tc.get("name"),
+                        "args": tc.get("args"),
+                    }
+                yield {"type": "ai_message", "message": message}
+            elif isinstance(message, ToolMessage):
+                yield {
+                    "type": "tool_result",
+                    "id": message.tool_call_id,
+                    "name": message.name,
+                    "content": _message_text(message.content),
+                }
+
+
+def stream_turn(executor, prompt, config):
+    """
+    Run one chat turn and yield events as they happen:
+
+    - {"type": "token", "text"}: LLM output tokens
+    - {"type": "tool_call", "id", "name", "args"}: a tool call was requested
+    - {"type": "tool_result", "id", "name", "content"}: a tool call finished
+    - {"type": "ai_message", "message"}: a model step completed; if it has
+      tool_calls, the tokens streamed for it were not the final answer
+
+    Uses the graph's "messages" (token) and "updates" (per-node delta)
+    stream modes, so per-event work does not grow with conversation length.
+    """
+    for mode, payload in executor.stream(
+        {"messages": [("user", prompt)]},
+        config=config,
+        stream_mode=["messages", "updates"],
+    ):
+        yield from _turn_events(mode, payload)
+
+
+async def astream_turn(executor, prompt, config):
+    """Async variant of `stream_turn`."""
+    async for mode, payload in executor.astream(
+        {"messages": [("user", prompt)]},
+        config=config,
+        stream_mode=["messages", "updates"],
+    ):
+        for event in _turn_events(mode, payload):
+            yield event
@@ -0,0 +1,38 @@
+import os
+from core.backends.base import VectorBackend, VectorPoint, SearchHit
+
+
+def create_backend(collection_name, embedding_model, embedding_dim, kind=None):
+    """
+    Build the vector backend selected by `VECTOR_BACKEND` ("qdrant" or "local").
+    """
+    kind = (kind or os.getenv("VECTOR_BACKEND", "qdrant")).lower()
+    if kind == "qdrant":
+        from core.backends.qdrant_backend import QdrantBackend
+
+        return QdrantBackend(
+            collection_name,
+            embedding_model,
+            embedding_dim,
+            url=os.getenv("QDRANT_URL", "http://localhost:6333"),
+            prefer_grpc=os.getenv("QDRANT_PREFER_GRPC", "false").lower() == "true",
+            grpc_port=int(os.getenv("QDRANT_GRPC_PORT", "6334")),
+            pool_size=int(os.getenv("QDRANT_POOL_SIZE") or 0) or None,
+            timeout=int(os.getenv("QDRANT_TIMEOUT") or 0) or None,
+            profile=os.getenv("QDRANT_PROFILE", "float32"),
+        )
+    if kind == "local":
+        from core.backends.local_backend import LocalBackend
+
+        return LocalBackend(
+            collection_name,
+            embedding_model,
+            embedding_dim,
+            path=os.getenv("LOCAL_VECTOR_PATH", "local_vectors"),
+            dtype=os.getenv("LOCAL_VECTOR_DTYPE", "float32"),
+            max_open_partitions=int(os.getenv("LOCAL_MAX_OPEN_PARTITIONS") or 256),
+        )
+    raise ValueError(f"Unknown VECTOR_BACKEND '{kind}' (expected 'qdrant' or 'local')")
+
+
+__all__ = ["VectorBackend", "VectorPoint", "SearchHit", "create_backend"]
@@ -0,0 +1,200 @@
+import re
+import asyncio
+from dataclasses import dataclass, field
+
+# A date-ordered query orders at most this many records matching its terms
+RECENCY_CANDIDATES = 50
+
+
+@dataclass
+class VectorPoint:
+    """A point to store: deterministic ID, embedding and payload."""
+
+    id: str
+    vector: list
+    payload: dict = field(default_factory=dict)
+
+
+@dataclass
+class SearchHit:
+    """A search result. Mirrors the `id`/`score`/`payload` shape of Qdrant's ScoredPoint."""
+
+    id: str
+    score: float
+    payload: dict = field(default_factory=dict)
+
+
+class VectorBackend:
+    """
+    Storage engine behind MedicalVectorStore.
+
+    The store owns embeddings, point IDs and content hashes; a backend only
+    persists points and runs patient-scoped vector queries. `collection_name`
+    is a stable alias that always resolves to the live physical collection;
+    rebuilds write a shadow collection and `swap_alias` makes it live.
+    """
+
+    def __init__(self, collection_name, embedding_model, embedding_dim):
+        self.collection_name = collection_name
+        self.embedding_model = embedding_model
+        self.embedding_dim = embedding_dim
+
+    @property
+    def collection_prefix(self):
+        """Physical collection name prefix for the current embedding configuration."""
+        model_slug = re.sub(r"[^A-Za-z0-9_-]+", "-", self.embedding_model)
+        return f"{self.collection_name}__{model_slug}__{self.embedding_dim}__"
+
+    def needs_rebuild(self):
+        """
+        True when the live index cannot be updated incrementally: it does not
+        exist yet or was built with another embedding model or dimension.
+        """
+        live = self.get_live_collection()
+        return live is None or not live.startswith(self.collection_prefix)
+
+    def ensure_collection(self):
+        """Bootstrap an empty live collection on first start."""
+        if self.get_live_collection() is None:
+            self.swap_alias(self.create_shadow_collection())
+
+    def migrate_payload_indexes(self):
+        """
+        Bring the live index's payload indexes up to date in place, if the
+        backend has any. Returns True if anything changed.
+        """
+        return False
+
+    def apply_storage_profile(self):
+        """
+        Reconfigure how the live index stores vectors (e.g. quantization),
+        if the backend supports it. Returns True if anything changed.
+        """
+        return False
+
+    def get_live_collection(self):
+        raise NotImplementedError
+
+    def create_shadow_collection(self):
+        raise NotImplementedError
+
+    def swap_alias(self, collection, drop_previous=True):
+        raise NotImplementedError
+
+    def upsert(self, points, collection_name=None):
+        raise NotImplementedError
+
+    def get_indexed_hashes(self, patient_id):
+        """Map point ID -> content_hash for every point stored for a patient."""
+        raise NotImplementedError
+
+    def delete_points(self, patient_id, point_ids):
+        raise NotImplementedError
+
+    def delete_patient(self, patient_id):
+        raise NotImplementedError
+
+    def get_indexed_patient_ids(self):
+        raise NotImplementedError
+
+    def copy_patients(self, patient_ids, collection_name):
+        """
+        Copy the live points of `patient_ids` into another collection as they
+        are (no re-embedding), e.g. to carry them into a shadow collection.
+        """
+        raise NotImplementedError
+
+    def query(
+        self,
+        vector,
+        patient_id,
+        limit=5,
+        event_type=None,
+        date_from=None,
+        date_to=None,
+        text=None,
+        order_by_date=False,
+    ):
+        """
+        Top-`limit` hits by cosine similarity within one patient's records.
+        When `text` is given, dense and lexical (BM25) rankings are combined
+        with reciprocal-rank fusion. With `order_by_date`, the records matching
+        the terms of `text` (up to `RECENCY_CANDIDATES`), or if there are none
+        the `limit` nearest records, are returned newest first instead.
+        """
+        raise NotImplementedError
+
+    def lexical_query(
+        self, text, patient_id, limit=5, event_type=None, date_from=None, date_to=None
+    ):
+        """Top-`limit` hits by BM25 over the chunk text only (no vector needed)."""
+        raise NotImplementedError
+
+    def latest(self, patient_id, limit=5, event_type=None, date_from=None, date_to=None):
+        """Most recent `limit` records by `timestamp`, newest first (no vector needed)."""
+        raise NotImplementedError
+
+    def query_batch(self, requests):
+        """
+        Run several queries in one go. Each request is a dict with `vector`,
+        `text`, `patient_id`, `limit`, `event_type`, `date_from`, `date_to`
+        and optionally `order_by_date`. A request with a vector is a
+        similarity query (hybrid if it also has text), with only text a
+        lexical query, and with neither a chronological `latest` lookup.
+        Returns one result list per request.
+        """
+        return [self._run_request(request) for request in requests]
+
+    def _run_request(self, request):
+        request = dict(request)
+        vector = request.pop("vector", None)
+        text = request.pop("text", None)
+        order_by_date = request.pop("order_by_date", False)
+        if vector is None and text:
+            return self.lexical_query(text, **request)
+        if vector is None:
+            return self.latest(**request)
+        return self.query(vector, text=text, order_by_date=order_by_date, **request)
+
+    # Async variants. Backends without a native async client run the sync call
+    # in a worker thread so callers can always await them.
+
+    async def aquery(
+        self,
+        vector,
+        patient_id,
+        limit=5,
+        event_type=None,
+        date_from=None,
+        date_to=None,
+        text=None,
+        order_by_date=False,
+    ):
+        return await asyncio.to_thread(
+            self.query,
+            vector,
+            patient_id,
+            limit,
+            event_type,
+            date_from,
+            date_to,
+            text,
+            order_by_date,
+        )
+
+    async def alexical_query(
+        self, text, patient_id, limit=5, event_type=None, date_from=None, date_to=None
+    ):
+        return await asyncio.to_thread(
+            self.lexical_query, text, patient_id, limit, event_type, date_from, date_to
+        )
+
+    async def alatest(
+        self, patient_id, limit=5, event_type=None, date_from=None, date_to=None
+    ):
+        return await asyncio.to_thread(
+            self.latest, patient_id, limit, event_type, date_from, date_to
+        )
+
+    async def aquery_batch(self, requests):
+        return await asyncio.to_thread(self.query_batch, requests)
@@ -0,0 +1,381 @@
+import os
+import glob
+import json
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from urllib.parse import quote, unquote
+import numpy as np
+from core.backends.base import RECENCY_CANDIDATES, VectorBackend, SearchHit
+from core.lexical import tokenize, bm25_scores, rrf_fuse
+
+PARTITION_PREFIX = "patient-"
+
+
+def parse_timestamp(value):
+    """ISO date/datetime string -> numpy datetime64 (NaT if missing or invalid)."""
+    if not value:
+        return np.datetime64("NaT", "s")
+    try:
+        return np.datetime64(str(value).replace("Z", ""), "s")
+    except ValueError:
+        return np.datetime64("NaT", "s")
+
+
+class _Partition:
+    """Immutable snapshot of one patient's vectors, payloads and filter masks."""
+
+    def __init__(self, ids, vectors, payloads):
+        self.ids = ids
+        self.vectors = vectors  # (n, dim) memory-mapped, rows L2-normalized
+        self.payloads = payloads
+        event_types = np.array([p.get("event_type", "") for p in payloads])
+        self.masks = {value: event_types == value for value in set(event_types)}
+        self.timestamps = np.array(
+            [parse_timestamp(p.get("timestamp")) for p in payloads],
+            dtype="datetime64[s]",
+        )
+        self._tokens = None
+
+    @property
+    def tokens(self):
+        """Tokenized chunk texts, built on first lexical query (the local inverted index)."""
+        if self._tokens is None:
+            self._tokens = [tokenize(p.get("text", "")) for p in self.payloads]
+        return self._tokens
+
+    def lexical_ranking(self, rows, text):
+        """Rows with a positive BM25 score for `text`, best first, with scores."""
+        scores = np.array(
+            bm25_scores(tokenize(text), [self.tokens[i] for i in rows]), dtype=np.float32
+        )
+        order = np.argsort(-scores, kind="stable")
+        order = order[scores[order] > 0]
+        return rows[order], scores[order]
+
+    def rows(self, event_type=None, date_from=None, date_to=None):
+        """Row indices matching the event type and inclusive date range."""
+        mask = np.ones(len(self.ids), dtype=bool)
+        if event_type:
+            mask &= self.masks.get(event_type, np.zeros(len(self.ids), dtype=bool))
+        if date_from:
+            mask &= self.timestamps >= parse_timestamp(date_from)
+        if date_to:
+            mask &= self.timestamps <= parse_timestamp(date_to)
+        return np.flatnonzero(mask)
+
+
+class LocalBackend(VectorBackend):
+    """
+    In-process exact-search backend for single-node deployments and tests.
+
+    Each patient is a partition directory holding a contiguous `.npy` matrix
+    (opened memory-mapped) and a `meta.json` side table with point IDs and
+    payloads. Writers publish a new vectors file and atomically replace
+    `meta.json`, so concurrent readers (threads or processes) always see a
+    consistent snapshot. Queries are a vectorized dot product over one
+    partition, i.e. exact cosine top-k in microseconds for per-patient sizes.
+
+    Layout under `path`:
+        medical_records.alias                       -> live collection name
+        medical_records__<model>__<dim>__<ts>/patient-<id>/meta.json
+        medical_records__<model>__<dim>__<ts>/patient-<id>/vectors-<token>.npy
+    """
+
+    def __init__(
+        self,
+        collection_name,
+        embedding_model,
+        embedding_dim,
+        path=None,
+        dtype=None,
+        max_open_partitions=256,
+    ):
+        super().__init__(collection_name, embedding_model, embedding_dim)
+        self.root = path or "local_vectors"
+        self.dtype = np.dtype(dtype or "float32")
+        os.makedirs(self.root, exist_ok=True)
+        self._alias_path = os.path.join(self.root, f"{collection_name}.alias")
+        # LRU of open partitions: each holds a memory map, and a process may
+        # only have vm.max_map_count of those
+        self.max_open_partitions = max_open_partitions
+        self._cache = OrderedDict()  # partition dir -> (file identity, _Partition)
+        self._cache_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+
+    # Collections and alias
+
+    def get_live_collection(self):
+        try:
+            with open(self._alias_path, "r") as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def create_shadow_collection(self):
+        collection = f"{self.collection_prefix}{int(time.time() * 1000)}"
+        os.makedirs(os.path.join(self.root, collection))
+        return collection
+
+    def swap_alias(self, collection, drop_previous=True):
+        previous = self.get_live_collection()
+        tmp_path = f"{self._alias_path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(collection)
+        os.replace(tmp_path, self._alias_path)
+
+        if drop_previous and previous is not None and previous != collection:
+            shutil.rmtree(os.path.join(self.root, previous), ignore_errors=True)
+
+    def _collection_dir(self, collection_name=None):
+        if collection_name in (None, self.collection_name):
+            collection_name = self.get_live_collection()
+        if collection_name is None:
+            raise RuntimeError(
+                f"No live collection for '{self.collection_name}'. Run ingestion first."
+            )
+        return os.path.join(self.root, collection_name)
+
+    def _partition_dir(self, patient_id, collection_name=None):
+        return os.path.join(
+            self._collection_dir(collection_name),
+            PARTITION_PREFIX + quote(str(patient_id), safe=""),
+        )
+
+    # Partition I/O
+
+    def _load(self, partition_dir):
+        meta_path = os.path.join(partition_dir, "meta.json")
+        try:
+            st = os.stat(meta_path)
+        except FileNotFoundError:
+            return None
+        identity = (st.st_ino, st.st_mtime_ns, st.st_size)
+        with self._cache_lock:
+            cached = self._cache.get(partition_dir)
+            if cached is not None and cached[0] == identity:
+                self._cache.move_to_end(partition_dir)
+                return cached[1]
+
+        with open(meta_path, "r") as f:
+            meta = json.load(f)
+        vectors = np.load(
+            os.path.join(partition_dir, meta["vectors_file"]), mmap_mode="r"
+        )
+        partition = _Partition(meta["ids"], vectors, meta["payloads"])
+        with self._cache_lock:
+            self._cache[partition_dir] = (identity, partition)
+            self._cache.move_to_end(partition_dir)
+            while len(self._cache) > self.max_open_partitions:
+                self._cache.popitem(last=False)
+        return partition
+
+    def _forget(self, partition_dir):
+        with self._cache_lock:
+            self._cache.pop(partition_dir, None)
+
+    def _write(self, partition_dir, ids, vectors, payloads, previous_file=None):
+        if not ids:
+            shutil.rmtree(partition_dir, ignore_errors=True)
+            self._forget(partition_dir)
+            return
+
+        os.makedirs(partition_dir, exist_ok=True)
+        vectors_file = f"vectors-{uuid.uuid4().hex[:12]}.npy"
+        np.save(os.path.join(partition_dir, vectors_file), vectors.astype(self.dtype))
+
+        meta = {"ids": ids, "payloads": payloads, "vectors_file": vectors_file}
+        tmp_path = os.path.join(partition_dir, f"meta.{uuid.uuid4().hex}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(tmp_path, os.path.join(partition_dir, "meta.json"))
+
+        # Keep the previous generation for readers that already hold its meta
+        keep = {vectors_file, previous_file}
+        for path in glob.glob(os.path.join(partition_dir, "vectors-*.npy")):
+            if os.path.basename(path) not in keep:
+                os.remove(path)
+
+    def _meta_vectors_file(self, partition_dir):
+        try:
+            with open(os.path.join(partition_dir, "meta.json"), "r") as f:
+                return json.load(f)["vectors_file"]
+        except FileNotFoundError:
+            return None
+
+    # Writes
+
+    def upsert(self, points, collection_name=None):
+        by_patient = {}
+        for point in points:
+            by_patient.setdefault(point.payload["patient_id"], []).append(point)
+
+        with self._write_lock:
+            for patient_id, patient_points in by_patient.items():
+                partition_dir = self._partition_dir(patient_id, collection_name)
+                partition = self._load(partition_dir)
+                if partition is None:
+                    ids, payloads = [], []
+                    vectors = np.empty((0, self.embedding_dim), dtype=np.float32)
+                else:
+                    ids, payloads = list(partition.ids), list(partition.payloads)
+                    vectors = np.array(partition.vectors, dtype=np.float32)
+
+                rows = {point_id: i for i, point_id in enumerate(ids)}
+                new_vectors = []
+                for point in patient_points:
+                    vector = np.asarray(point.vector, dtype=np.float32)
+                    vector /= np.linalg.norm(vector) or 1.0
+                    if point.id in rows:
+                        vectors[rows[point.id]] = vector
+                        payloads[rows[point.id]] = point.payload
+                    else:
+                        rows[point.id] = len(ids)
+                        ids.append(point.id)
+                        payloads.append(point.payload)
+                        new_vectors.append(vector)
+                if new_vectors:
+                    vectors = np.vstack([vectors, np.stack(new_vectors)])
+
+                self._write(
+                    partition_dir,
+                    ids,
+                    vectors,
+                    payloads,
+                    previous_file=self._meta_vectors_file(partition_dir),
+                )
+
+    def delete_points(self, patient_id, point_ids):
+        point_ids = set(point_ids)
+        if not point_ids:
+            return
+        with self._write_lock:
+            partition_dir = self._partition_dir(patient_id)
+            partition = self._load(partition_dir)
+            if partition is None:
+                return
+            keep = [i for i, point_id in enumerate(partition.ids) if point_id not in point_ids]
+            self._write(
+                partition_dir,
+                [partition.ids[i] for i in keep],
+                np.array(partition.vectors[keep], dtype=np.float32),
+                [partition.payloads[i] for i in keep],
+                previous_file=self._meta_vectors_file(partition_dir),
+            )
+
+    def delete_patient(self, patient_id):
+        with self._write_lock:
+            partition_dir = self._partition_dir(patient_id)
+            shutil.rmtree(partition_dir, ignore_errors=True)
+            self._forget(partition_dir)
+
+    # Reads
+
+    def get_indexed_hashes(self, patient_id):
+        partition = self._load(self._partition_dir(patient_id))
+        if partition is None:
+            return {}
+        return {
+            point_id: payload.get("content_hash")
+            for point_id, payload in zip(partition.ids, partition.payloads)
+        }
+
+    def get_indexed_patient_ids(self):
+        return {
+            unquote(name[len(PARTITION_PREFIX) :])
+            for name in os.listdir(self._collection_dir())
+            if name.startswith(PARTITION_PREFIX)
+        }
+
+    def copy_patients(self, patient_ids, collection_name):
+        for patient_id in patient_ids:
+            source = self._partition_dir(patient_id)
+            if os.path.isdir(source):
+                shutil.copytree(
+                    source,
+                    self._partition_dir(patient_id, collection_name),
+                    dirs_exist_ok=True,
+                )
+
+    def _hits(self, partition, rows, scores):
+        return [
+            SearchHit(
+                id=partition.ids[row], score=float(score), payload=partition.payloads[row]
+            )
+            for row, score in zip(rows, scores)
+        ]
+
+    def query(
+        self,
+        vector,
+        patient_id,
+        limit=5,
+        event_type=None,
+        date_from=None,
+        date_to=None,
+        text=None,
+        order_by_date=False,
+    ):
+        if order_by_date:
+            # Records matching the query's terms, or if none do the `limit`
+            # nearest ones, newest first (ties keep relevance)
+            filters = dict(event_type=event_type, date_from=date_from, date_to=date_to)
+            hits = []
+            if text:
+                hits = self.lexical_query(
+                    text, patient_id, max(limit, RECENCY_CANDIDATES), **filters
+                )
+            if not hits:
+                hits = self.query(vector, patient_id, limit, **filters)
+            hits.sort(key=lambda hit: hit.payload.get("timestamp") or "", reverse=True)
+            return hits[:limit]
+
+        partition = self._load(self._partition_dir(patient_id))
+        if partition is None:
+            return []
+
+        rows = partition.rows(event_type, date_from, date_to)
+        query = np.asarray(vector, dtype=np.float32)
+        query /= np.linalg.norm(query) or 1.0
+        scores = np.asarray(partition.vectors[rows], dtype=np.float32) @ query
+
+        if text:
+            # Hybrid: fuse the full dense ranking with the BM25 ranking
+            dense_rows = rows[np.argsort(-scores, kind="stable")]
+            lexical_rows, _ = partition.lexical_ranking(rows, text)
+            fused = rrf_fuse([dense_rows.tolist(), lexical_rows.tolist()], limit)
+            return self._hits(partition, [r for r, _ in fused], [f for _, f in fused])
+
+        if limit < len(scores):
+            top = np.argpartition(-scores, limit)[:limit]
+            top = top[np.argsort(-scores[top])]
+        else:
+            top = np.argsort(-scores)
+        return self._hits(partition, rows[top], scores[top])
+
+    def lexical_query(
+        self, text, patient_id, limit=5, event_type=None, date_from=None, date_to=None
+    ):
+        partition = self._load(self._partition_dir(patient_id))
+        if partition is None:
+            return []
+        rows, scores = partition.lexical_ranking(
+            partition.rows(event_type, date_from, date_to), text
+        )
+        return self._hits(partition, rows[:limit], scores[:limit])
+
+    def latest(self, patient_id, limit=5, event_type=None, date_from=None, date_to=None):
+        partition = self._load(self._partition_dir(patient_id))
+        if partition is None:
+            return []
+
+        rows = partition.rows(event_type, date_from, date_to)
+        # Records without a timestamp can never be "latest"
+        rows = rows[~np.isnat(partition.timestamps[rows])]
+        order = np.argsort(partition.timestamps[rows], kind="stable")[::-1][:limit]
+        return [
+            SearchHit(id=partition.ids[i], score=0.0, payload=partition.payloads[i])
+            for i in rows[order]
+        ]
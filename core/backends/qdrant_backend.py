@@ -0,0 +1,657 @@
+import time
+from qdrant_client import QdrantClient, AsyncQdrantClient
+from qdrant_client.http import models
+from core.backends.base import RECENCY_CANDIDATES, VectorBackend, VectorPoint
+from core.backends.qdrant_profiles import TENANT_HNSW, get_profile
+from core.lexical import document_sparse_vector, query_sparse_vector
+
+# Named sparse vector holding BM25 term weights; IDF is applied by Qdrant
+SPARSE_VECTOR_NAME = "bm25"
+
+# Each side of a hybrid query prefetches this many times `limit` candidates
+HYBRID_PREFETCH_FACTOR = 4
+
+# Payload indexes. patient_id is the tenant key: Qdrant co-locates each
+# patient's points and builds its HNSW graph per patient (see TENANT_HNSW);
+# event_type and timestamp only filter inside a patient, so no graph links
+# are built for them.
+PAYLOAD_INDEXES = {
+    "patient_id": models.KeywordIndexParams(
+        type=models.KeywordIndexType.KEYWORD, is_tenant=True
+    ),
+    "event_type": models.KeywordIndexParams(
+        type=models.KeywordIndexType.KEYWORD, enable_hnsw=False
+    ),
+    # DATETIME (not KEYWORD) so date ranges and order_by run server-side
+    "timestamp": models.DatetimeIndexParams(
+        type=models.DatetimeIndexType.DATETIME, enable_hnsw=False
+    ),
+}
+
+
+def patient_filter(patient_id):
+    return models.FieldCondition(
+        key="patient_id", match=models.MatchValue(value=patient_id)
+    )
+
+
+def build_filter(patient_id, event_type=None, date_from=None, date_to=None):
+    """Patient-scoped filter with optional event type and inclusive date range."""
+    must_filters = [patient_filter(patient_id)]
+
+    if event_type:
+        must_filters.append(
+            models.FieldCondition(
+                key="event_type", match=models.MatchValue(value=event_type)
+            )
+        )
+
+    if date_from or date_to:
+        must_filters.append(
+            models.FieldCondition(
+                key="timestamp",
+                range=models.DatetimeRange(gte=date_from, lte=date_to),
+            )
+        )
+
+    return models.Filter(must=must_filters)
+
+
+def dense_vector(vector):
+    """The unnamed dense vector of a stored point (sparse vectors are derived)."""
+    return vector[""] if isinstance(vector, dict) else vector
+
+
+def build_query(
+    vector=None, text=None, query_filter=None, limit=5, params=None, order_by_date=False
+):
+    """
+    `query`/`using`/`prefetch`/`params` arguments for one retrieval mode:
+    dense (vector), lexical (text), hybrid RRF fusion (both) or chronological
+    order_by on `timestamp` (neither). With `order_by_date`, the records that
+    match the query's terms (up to `RECENCY_CANDIDATES`), or without text the
+    `limit` nearest ones, are prefetched and ordered by `timestamp`. `params`
+    (HNSW ef, quantization rescoring) apply to the dense search only.
+    """
+    newest_first = models.OrderByQuery(
+        order_by=models.OrderBy(key="timestamp", direction=models.Direction.DESC)
+    )
+    sparse = None
+    if text:
+        indices, values = query_sparse_vector(text)
+        if indices:
+            sparse = models.SparseVector(indices=indices, values=values)
+
+    if vector is None and sparse is None:
+        return {"query": newest_first}
+    if order_by_date:
+        # Only actual matches are ordered by date: dense similarity alone has
+        # no cutoff, so every record of a small patient would be a candidate
+        if sparse is not None:
+            candidates = max(limit, RECENCY_CANDIDATES)
+            relevant = {"query": sparse, "using": SPARSE_VECTOR_NAME}
+        else:
+            candidates = limit
+            relevant = {"query": vector, "params": params}
+        return {
+            "prefetch": models.Prefetch(
+                filter=query_filter, limit=candidates, **relevant
+            ),
+            "query": newest_first,
+        }
+    if sparse is None:
+        return {"query": vector, "params": params}
+    if vector is None:
+        return {"query": sparse, "using": SPARSE_VECTOR_NAME}
+    prefetch_limit = limit * HYBRID_PREFETCH_FACTOR
+    return {
+        "prefetch": [
+            models.Prefetch(
+                query=vector, filter=query_filter, limit=prefetch_limit, params=params
+            ),
+            models.Prefetch(
+                query=sparse,
+                using=SPARSE_VECTOR_NAME,
+                filter=query_filter,
+                limit=prefetch_limit,
+            ),
+        ],
+        "query": models.FusionQuery(fusion=models.Fusion.RRF),
+    }
+
+
+def needs_dense_retry(request, points):
+    """
+    True for a date-ordered query whose terms matched nothing: it is retried
+    as the `limit` nearest records, newest first.
+    """
+    return (
+        not points
+        and request.get("order_by_date")
+        and bool(request.get("text"))
+        and request.get("vector") is not None
+    )
+
+
+def build_query_request(request, params=None):
+    """Backend batch request dict -> Qdrant QueryRequest."""
+    query_filter = build_filter(
+        request["patient_id"],
+        request.get("event_type"),
+        request.get("date_from"),
+        request.get("date_to"),
+    )
+    limit = request.get("limit", 5)
+    return models.QueryRequest(
+        filter=query_filter,
+        limit=limit,
+        with_payload=True,
+        **build_query(
+            request.get("vector"),
+            request.get("text"),
+            query_filter,
+            limit,
+            params,
+            request.get("order_by_date", False),
+        ),
+    )
+
+
+class QdrantBackend(VectorBackend):
+    """
+    Qdrant server (or `:memory:` / local path) backend.
+
+    Against a server, a pooled sync client serves ingestion and blocking
+    callers, and an AsyncQdrantClient (created lazily, same connection
+    settings) serves `aquery`/`alatest`. With `prefer_grpc` both use the gRPC
+    port instead of REST.
+    """
+
+    def __init__(
+        self,
+        collection_name,
+        embedding_model,
+        embedding_dim,
+        url=None,
+        prefer_grpc=False,
+        grpc_port=6334,
+        pool_size=None,
+        timeout=None,
+        profile=None,
+    ):
+        super().__init__(collection_name, embedding_model, embedding_dim)
+        # Vector storage profile (see qdrant_profiles.py)
+        self.profile = get_profile(profile)
+        self.search_params = self.profile.search_params()
+        self.url = url or "http://localhost:6333"
+        self.is_remote = self.url.startswith(("http://", "https://"))
+        self._async_client = None
+        if self.is_remote:
+            self._client_kwargs = {
+                "url": self.url,
+                "prefer_grpc": prefer_grpc,
+                "grpc_port": grpc_port,
+                "pool_size": pool_size,
+                "timeout": timeout,
+            }
+            self.client = QdrantClient(**self._client_kwargs)
+        elif self.url == ":memory:":
+            # In-process local mode, mostly for tests and benchmarks
+            self.client = QdrantClient(location=self.url)
+        else:
+            # Local mode persisted under a directory (`location=` would take it
+            # for a host name)
+            self.client = QdrantClient(path=self.url)
+
+    @property
+    def async_client(self):
+        if self._async_client is None:
+            self._async_client = AsyncQdrantClient(**self._client_kwargs)
+        return self._async_client
+
+    def get_live_collection(self):
+        for alias in self.client.get_aliases().aliases:
+            if alias.alias_name == self.collection_name:
+                return alias.collection_name
+        return None
+
+    def _has_legacy_collection(self):
+        """True if `medical_records` is still a plain collection instead of an alias."""
+        collections = self.client.get_collections().collections
+        return any(c.name == self.collection_name for c in collections)
+
+    def ensure_collection(self):
+        # A legacy plain collection is left for the ingestion script to migrate
+        if not self._has_legacy_collection():
+            super().ensure_collection()
+
+    def migrate_payload_indexes(self):
+        """
+        Migrate payload indexes of older collections in place: a KEYWORD
+        `timestamp` becomes DATETIME (range filters and order_by need it) and
+        `patient_id` becomes the tenant index. Returns True if anything changed.
+        """
+        # Local mode has no payload indexes
+        if self.get_live_collection() is None or not self.is_remote:
+            return False
+        schema = self.client.get_collection(self.collection_name).payload_schema
+        changed = False
+        for field_name, field_schema in PAYLOAD_INDEXES.items():
+            index = schema.get(field_name)
+            if index is not None and (
+                index.data_type.value == field_schema.type.value
+                and bool(getattr(index.params, "is_tenant", False))
+                == bool(getattr(field_schema, "is_tenant", False))
+            ):
+                continue
+            if index is not None:
+                self.client.delete_payload_index(
+                    collection_name=self.collection_name, field_name=field_name
+                )
+            self.client.create_payload_index(
+                collection_name=self.collection_name,
+                field_name=field_name,
+                field_schema=field_schema,
+            )
+            changed = True
+        return changed
+
+    def needs_rebuild(self):
+        # Collections created before hybrid search have no sparse vectors
+        if super().needs_rebuild():
+            return True
+        params = self.client.get_collection(self.collection_name).config.params
+        return SPARSE_VECTOR_NAME not in (params.sparse_vectors or {})
+
+    def create_shadow_collection(self):
+        collection = f"{self.collection_prefix}{int(time.time() * 1000)}"
+        self.client.create_collection(
+            collection_name=collection,
+            vectors_config=models.VectorParams(
+                size=self.embedding_dim,  # Reduced dimension for more general matching
+                distance=models.Distance.COSINE,
+                on_disk=self.profile.on_disk,
+            ),
+            sparse_vectors_config={
+                SPARSE_VECTOR_NAME: models.SparseVectorParams(
+                    modifier=models.Modifier.IDF,
+                    index=models.SparseIndexParams(on_disk=self.profile.on_disk),
+                )
+            },
+            hnsw_config=TENANT_HNSW,
+            quantization_config=self.profile.quantization,
+            on_disk_payload=self.profile.on_disk,
+        )
+        # Add payload indexes for filterable keys
+        for field_name, field_schema in PAYLOAD_INDEXES.items():
+            self.client.create_payload_index(
+                collection_name=collection,
+                field_name=field_name,
+                field_schema=field_schema,
+            )
+        return collection
+
+    def apply_storage_profile(self):
+        """
+        Bring the live collection in line with the configured profile in place
+        (quantization, on-disk vectors, per-tenant HNSW), without re-embedding. Qdrant
+        rebuilds the affected segments in the background. Returns True if
+        anything changed.
+        """
+        live = self.get_live_collection()
+        # Local mode (':memory:' or a path) keeps float32 vectors regardless
+        if live is None or not self.is_remote:
+            return False
+        config = self.client.get_collection(live).config
+        quantization = config.quantization_config
+        current_kind = (
+            "scalar"
+            if getattr(quantization, "scalar", None)
+            else "binary"
+            if getattr(quantization, "binary", None)
+            else None
+        )
+        hnsw = config.hnsw_config
+        if (
+            current_kind == self.profile.quantization_kind
+            and bool(config.params.vectors.on_disk) == self.profile.on_disk
+            and (hnsw.m, hnsw.payload_m, hnsw.ef_construct, hnsw.full_scan_threshold)
+            == (
+                TENANT_HNSW.m,
+                TENANT_HNSW.payload_m,
+                TENANT_HNSW.ef_construct,
+                TENANT_HNSW.full_scan_threshold,
+            )
+        ):
+            return False
+
+        self.client.update_collection(
+            collection_name=live,
+            vectors_config={"": models.VectorParamsDiff(on_disk=self.profile.on_disk)},
+            hnsw_config=TENANT_HNSW,
+            quantization_config=self.profile.quantization or models.Disabled.DISABLED,
+        )
+        return True
+
+    def swap_alias(self, collection, drop_previous=True):
+        """
+        Atomically point the alias at `collection`.
+
+        A legacy plain `medical_records` collection has to be deleted before
+        the alias can take its name; that one-time migration is the only
+        moment the index is briefly unavailable.
+        """
+        previous = self.get_live_collection()
+        operations = []
+        if previous is not None:
+            operations.append(
+                models.DeleteAliasOperation(
+                    delete_alias=models.DeleteAlias(alias_name=self.collection_name)
+                )
+            )
+        elif self._has_legacy_collection():
+            self.client.delete_collection(self.collection_name)
+        operations.append(
+            models.CreateAliasOperation(
+                create_alias=models.CreateAlias(
+                    collection_name=collection, alias_name=self.collection_name
+                )
+            )
+        )
+        self.client.update_collection_aliases(change_aliases_operations=operations)
+
+        if drop_previous and previous is not None and previous != collection:
+            self.client.delete_collection(previous)
+
+    def upsert(self, points, collection_name=None):
+        self.client.upsert(
+            collection_name=collection_name or self.collection_name,
+            points=[self._point_struct(p) for p in points],
+        )
+
+    @staticmethod
+    def _point_struct(point):
+        """Dense vector plus BM25 sparse vector computed from the chunk text."""
+        indices, values = document_sparse_vector(point.payload.get("text", ""))
+        return models.PointStruct(
+            id=point.id,
+            vector={
+                "": point.vector,
+                SPARSE_VECTOR_NAME: models.SparseVector(indices=indices, values=values),
+            },
+            payload=point.payload,
+        )
+
+    def get_indexed_hashes(self, patient_id):
+        hashes = {}
+        offset = None
+        while True:
+            records, offset = self.client.scroll(
+                collection_name=self.collection_name,
+                scroll_filter=models.Filter(must=[patient_filter(patient_id)]),
+                with_payload=["content_hash"],
+                with_vectors=False,
+                limit=1000,
+                offset=offset,
+            )
+            for record in records:
+                hashes[str(record.id)] = (record.payload or {}).get("content_hash")
+            if offset is None:
+                return hashes
+
+    def delete_points(self, patient_id, point_ids):
+        if point_ids:
+            self.client.delete(
+                collection_name=self.collection_name,
+                points_selector=models.PointIdsList(points=list(point_ids)),
+            )
+
+    def delete_patient(self, patient_id):
+        self.client.delete(
+            collection_name=self.collection_name,
+            points_selector=models.FilterSelector(
+                filter=models.Filter(must=[patient_filter(patient_id)])
+            ),
+        )
+
+    def get_indexed_patient_ids(self):
+        hits = self.client.facet(
+            collection_name=self.collection_name,
+            key="patient_id",
+            limit=1_000_000,
+            exact=True,
+        ).hits
+        return {hit.value for hit in hits}
+
+    def copy_patients(self, patient_ids, collection_name):
+        for patient_id in patient_ids:
+            offset = None
+            while True:
+                records, offset = self.client.scroll(
+                    collection_name=self.collection_name,
+                    scroll_filter=models.Filter(must=[patient_filter(patient_id)]),
+                    with_payload=True,
+                    with_vectors=[""],
+                    limit=1000,
+                    offset=offset,
+                )
+                if records:
+                    self.upsert(
+                        [
+                            VectorPoint(
+                                id=record.id,
+                                vector=dense_vector(record.vector),
+                                payload=record.payload,
+                            )
+                            for record in records
+                        ],
+                        collection_name=collection_name,
+                    )
+                if offset is None:
+                    break
+
+    def _query_points(
+        self, client, vector, text, patient_id, limit, order_by_date=False, **filters
+    ):
+        query_filter = build_filter(patient_id, **filters)
+        query = build_query(
+            vector, text, query_filter, limit, self.search_params, order_by_date
+        )
+        return client.query_points(
+            collection_name=self.collection_name,
+            query_filter=query_filter,
+            limit=limit,
+            with_payload=True,
+            search_params=query.pop("params", None),
+            **query,
+        )
+
+    def query(
+        self,
+        vector,
+        patient_id,
+        limit=5,
+        event_type=None,
+        date_from=None,
+        date_to=None,
+        text=None,
+        order_by_date=False,
+    ):
+        filters = dict(event_type=event_type, date_from=date_from, date_to=date_to)
+        points = self._query_points(
+            self.client,
+            vector,
+            text,
+            patient_id,
+            limit,
+            order_by_date=order_by_date,
+            **filters,
+        ).points
+        request = dict(vector=vector, text=text, order_by_date=order_by_date)
+        if needs_dense_retry(request, points):
+            points = self._query_points(
+                self.client, vector, None, patient_id, limit, True, **filters
+            ).points
+        return points
+
+    def lexical_query(
+        self, text, patient_id, limit=5, event_type=None, date_from=None, date_to=None
+    ):
+        if not query_sparse_vector(text)[0]:
+            return []
+        return self._query_points(
+            self.client,
+            None,
+            text,
+            patient_id,
+            limit,
+            event_type=event_type,
+            date_from=date_from,
+            date_to=date_to,
+        ).points
+
+    def latest(self, patient_id, limit=5, event_type=None, date_from=None, date_to=None):
+        records, _ = self.client.scroll(
+            collection_name=self.collection_name,
+            scroll_filter=build_filter(patient_id, event_type, date_from, date_to),
+            order_by=models.OrderBy(key="timestamp", direction=models.Direction.DESC),
+            limit=limit,
+            with_payload=True,
+            with_vectors=False,
+        )
+        return records
+
+    def query_batch(self, requests):
+        """All requests in a single round trip through the batch query endpoint."""
+        if not requests:
+            return []
+        results = self._batch_points(requests)
+        retry = [
+            i
+            for i, (request, points) in enumerate(zip(requests, results))
+            if needs_dense_retry(request, points)
+        ]
+        if retry:
+            retried = self._batch_points(
+                [{**requests[i], "text": None} for i in retry]
+            )
+            for i, points in zip(retry, retried):
+                results[i] = points
+        return results
+
+    def _batch_points(self, requests):
+        responses = self.client.query_batch_points(
+            collection_name=self.collection_name,
+            requests=[
+                build_query_request(request, self.search_params)
+                for request in requests
+            ],
+        )
+        return [response.points for response in responses]
+
+    async def aquery(
+        self,
+        vector,
+        patient_id,
+        limit=5,
+        event_type=None,
+        date_from=None,
+        date_to=None,
+        text=None,
+        order_by_date=False,
+    ):
+        if not self.is_remote:
+            # A second local client would not see the same in-memory data
+            return await super().aquery(
+                vector,
+                patient_id,
+                limit,
+                event_type,
+                date_from,
+                date_to,
+                text,
+                order_by_date,
+            )
+        filters = dict(event_type=event_type, date_from=date_from, date_to=date_to)
+        response = await self._query_points(
+            self.async_client,
+            vector,
+            text,
+            patient_id,
+            limit,
+            order_by_date=order_by_date,
+            **filters,
+        )
+        request = dict(vector=vector, text=text, order_by_date=order_by_date)
+        if needs_dense_retry(request, response.points):
+            response = await self._query_points(
+                self.async_client, vector, None, patient_id, limit, True, **filters
+            )
+        return response.points
+
+    async def alexical_query(
+        self, text, patient_id, limit=5, event_type=None, date_from=None, date_to=None
+    ):
+        if not self.is_remote:
+            return await super().alexical_query(
+                text, patient_id, limit, event_type, date_from, date_to
+            )
+        if not query_sparse_vector(text)[0]:
+            return []
+        response = await self._query_points(
+            self.async_client,
+            None,
+            text,
+            patient_id,
+            limit,
+            event_type=event_type,
+            date_from=date_from,
+            date_to=date_to,
+        )
+        return response.points
+
+    async def alatest(
+        self, patient_id, limit=5, event_type=None, date_from=None, date_to=None
+    ):
+        if not self.is_remote:
+            return await super().alatest(
+                patient_id, limit, event_type, date_from, date_to
+            )
+        records, _ = await self.async_client.scroll(
+            collection_name=self.collection_name,
+            scroll_filter=build_filter(patient_id, event_type, date_from, date_to),
+            order_by=models.OrderBy(key="timestamp", direction=models.Direction.DESC),
+            limit=limit,
+            with_payload=True,
+            with_vectors=False,
+        )
+        return records
+
+    async def aquery_batch(self, requests):
+        if not self.is_remote:
+            return await super().aquery_batch(requests)
+        if not requests:
+            return []
+        results = await self._abatch_points(requests)
+        retry = [
+            i
+            for i, (request, points) in enumerate(zip(requests, results))
+            if needs_dense_retry(request, points)
+        ]
+        if retry:
+            retried = await self._abatch_points(
+                [{**requests[i], "text": None} for i in retry]
+            )
+            for i, points in zip(retry, retried):
+                results[i] = points
+        return results
+
+    async def _abatch_points(self, requests):
+        responses = await self.async_client.query_batch_points(
+            collection_name=self.collection_name,
+            requests=[
+                build_query_request(request, self.search_params)
+                for request in requests
+            ],
+        )
+        return [response.points for response in responses]
@@ -0,0 +1,96 @@
+from dataclasses import dataclass
+from typing import Optional
+
+from qdrant_client.http import models
+
+# Every search is scoped to one patient, so there is no global HNSW graph
+# (m=0): Qdrant builds one graph per patient_id tenant (payload_m) instead,
+# and a patient's search cost does not grow with the number of patients.
+# Patients whose vectors fit in `full_scan_threshold` KB (~10k float32
+# 512-dim vectors) skip the graph and are scanned exactly.
+TENANT_HNSW = models.HnswConfigDiff(
+    m=0, payload_m=16, ef_construct=128, full_scan_threshold=20000
+)
+
+
+@dataclass(frozen=True)
+class CollectionProfile:
+    """
+    How a collection stores its dense vectors and how queries search them.
+
+    With quantization, the compressed vectors stay in RAM and drive the HNSW
+    traversal; `oversampling` x limit candidates are then rescored against the
+    original float32 vectors, which `on_disk` keeps memory-mapped from disk.
+    """
+
+    name: str
+    quantization: Optional[object] = None
+    on_disk: bool = False
+    oversampling: Optional[float] = None
+    hnsw_ef: Optional[int] = None
+    # Resident bytes per dimension of the vectors searched in RAM
+    ram_bytes_per_dim: float = 4.0
+
+    @property
+    def quantization_kind(self):
+        if isinstance(self.quantization, models.ScalarQuantization):
+            return "scalar"
+        if isinstance(self.quantization, models.BinaryQuantization):
+            return "binary"
+        return None
+
+    def search_params(self, oversampling=None, rescore=True):
+        """Query-time params; None for a plain float32 collection."""
+        if self.quantization is None and self.hnsw_ef is None:
+            return None
+        quantization = None
+        if self.quantization is not None:
+            quantization = models.QuantizationSearchParams(
+                rescore=rescore,
+                oversampling=oversampling or self.oversampling,
+            )
+        return models.SearchParams(hnsw_ef=self.hnsw_ef, quantization=quantization)
+
+    def ram_bytes(self, vectors, dim):
+        """Estimated resident memory of `vectors` dense vectors."""
+        return int(vectors * dim * self.ram_bytes_per_dim)
+
+
+PROFILES = {
+    # Original behaviour: float32 vectors in RAM, exact-precision HNSW
+    "float32": CollectionProfile(name="float32", ram_bytes_per_dim=4.0),
+    # 4x smaller: int8 scalar quantization in RAM, originals on disk for rescoring
+    "int8": CollectionProfile(
+        name="int8",
+        quantization=models.ScalarQuantization(
+            scalar=models.ScalarQuantizationConfig(
+                type=models.ScalarType.INT8, quantile=0.99, always_ram=True
+            )
+        ),
+        on_disk=True,
+        oversampling=2.0,
+        hnsw_ef=128,
+        ram_bytes_per_dim=1.0,
+    ),
+    # 32x smaller: 1 bit per dimension in RAM; needs more oversampling to
+    # recover recall at 512 dimensions
+    "binary": CollectionProfile(
+        name="binary",
+        quantization=models.BinaryQuantization(
+            binary=models.BinaryQuantizationConfig(always_ram=True)
+        ),
+        on_disk=True,
+        oversampling=4.0,
+        hnsw_ef=128,
+        ram_bytes_per_dim=1 / 8,
+    ),
+}
+
+
+def get_profile(name):
+    profile = PROFILES.get((name or "float32").lower())
+    if profile is None:
+        raise ValueError(
+            f"Unknown QDRANT_PROFILE '{name}' (expected one of {', '.join(PROFILES)})"
+        )
+    return profile
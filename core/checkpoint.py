@@ -0,0 +1,156 @@
+import os
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+from langgraph.checkpoint.memory import InMemorySaver
+
+
+class BoundedThreadsMixin:
+    """
+    Bounds a checkpointer by thread count and idle time.
+
+    Every read or write of a thread marks it as recently used; threads beyond
+    `max_threads` (least recently used first) or idle longer than
+    `ttl_seconds` are deleted with the saver's own `delete_thread`.
+    """
+
+    def _init_bounds(self, max_threads, ttl_seconds):
+        self.max_threads = max_threads
+        self.ttl_seconds = ttl_seconds
+        self._last_access = OrderedDict()  # thread_id -> monotonic timestamp
+        self._bounds_lock = threading.RLock()
+
+    def _touch(self, config):
+        thread_id = (config or {}).get("configurable", {}).get("thread_id")
+        if thread_id is None:
+            return
+        now = time.monotonic()
+        with self._bounds_lock:
+            self._last_access[thread_id] = now
+            self._last_access.move_to_end(thread_id)
+            expired = []
+            while self._last_access:
+                oldest, last_seen = next(iter(self._last_access.items()))
+                too_many = len(self._last_access) > self.max_threads
+                too_old = self.ttl_seconds and now - last_seen > self.ttl_seconds
+                if oldest == thread_id or not (too_many or too_old):
+                    break
+                self._last_access.popitem(last=False)
+                expired.append(oldest)
+        for old_thread in expired:
+            self.delete_thread(old_thread)
+
+    def get_tuple(self, config):
+        self._touch(config)
+        return super().get_tuple(config)
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        self._touch(config)
+        return super().put(config, checkpoint, metadata, new_versions)
+
+    def put_writes(self, config, writes, task_id, task_path=""):
+        self._touch(config)
+        return super().put_writes(config, writes, task_id, task_path)
+
+
+class SharedBoundedThreadsMixin(BoundedThreadsMixin):
+    """
+    BoundedThreadsMixin for a checkpointer shared by several processes (API
+    workers). Last access times live in the checkpoint database itself, and a
+    touch records and evicts in one write transaction, so a worker never
+    deletes a thread that another worker has just used.
+    """
+
+    def _init_bounds(self, max_threads, ttl_seconds):
+        super()._init_bounds(max_threads, ttl_seconds)
+        with self.cursor() as cur:
+            cur.execute(
+                "CREATE TABLE IF NOT EXISTS thread_access "
+                "(thread_id TEXT PRIMARY KEY, last_access REAL NOT NULL)"
+            )
+            cur.execute(
+                "CREATE INDEX IF NOT EXISTS thread_access_last_access "
+                "ON thread_access (last_access)"
+            )
+            # Threads from before access was tracked start their TTL now
+            cur.execute(
+                "INSERT OR IGNORE INTO thread_access (thread_id, last_access) "
+                "SELECT DISTINCT thread_id, ? FROM checkpoints",
+                (time.time(),),
+            )
+
+    def _touch(self, config):
+        thread_id = (config or {}).get("configurable", {}).get("thread_id")
+        if thread_id is None:
+            return
+        thread_id = str(thread_id)
+        # Wall-clock time, since other processes compare against it
+        now = time.time()
+        cutoff = now - self.ttl_seconds if self.ttl_seconds else 0
+        with self.cursor() as cur:
+            cur.execute("BEGIN IMMEDIATE")
+            cur.execute(
+                "INSERT INTO thread_access (thread_id, last_access) VALUES (?, ?) "
+                "ON CONFLICT(thread_id) "
+                "DO UPDATE SET last_access = excluded.last_access",
+                (thread_id, now),
+            )
+            expired = [
+                old_thread
+                for (old_thread,) in cur.execute(
+                    "SELECT thread_id FROM thread_access WHERE thread_id != ? "
+                    "AND (last_access < ? OR thread_id NOT IN (SELECT thread_id "
+                    "FROM thread_access ORDER BY last_access DESC LIMIT ?))",
+                    (thread_id, cutoff, self.max_threads),
+                ).fetchall()
+            ]
+            for table in ("thread_access", "checkpoints", "writes"):
+                cur.executemany(
+                    f"DELETE FROM {table} WHERE thread_id = ?",
+                    [(old_thread,) for old_thread in expired],
+                )
+
+
+class BoundedMemorySaver(BoundedThreadsMixin, InMemorySaver):
+    """In-memory checkpointer with LRU/TTL eviction of conversation threads."""
+
+    def __init__(self, max_threads=500, ttl_seconds=12 * 3600, **kwargs):
+        super().__init__(**kwargs)
+        self._init_bounds(max_threads, ttl_seconds)
+
+
+def create_sqlite_saver(path, max_threads, ttl_seconds):
+    """
+    SQLite-backed checkpointer so conversations survive restarts. Requires the
+    optional `langgraph-checkpoint-sqlite` package.
+    """
+    try:
+        from langgraph.checkpoint.sqlite import SqliteSaver
+    except ImportError as e:
+        raise ImportError(
+            "CHECKPOINTER=sqlite requires `pip install langgraph-checkpoint-sqlite`"
+        ) from e
+
+    class BoundedSqliteSaver(SharedBoundedThreadsMixin, SqliteSaver):
+        pass
+
+    saver = BoundedSqliteSaver(sqlite3.connect(path, check_same_thread=False))
+    saver._init_bounds(max_threads, ttl_seconds)
+    return saver
+
+
+def create_checkpointer():
+    """Shared checkpointer configured from CHECKPOINTER ("memory" or "sqlite")."""
+    max_threads = int(os.getenv("CHECKPOINT_MAX_THREADS", "500"))
+    ttl_seconds = int(os.getenv("CHECKPOINT_TTL_SECONDS", str(12 * 3600)))
+    kind = os.getenv("CHECKPOINTER", "memory").lower()
+    if kind == "sqlite":
+        return create_sqlite_saver(
+            os.getenv("CHECKPOINT_DB_PATH", "checkpoints.sqlite"),
+            max_threads,
+            ttl_seconds,
+        )
+    if kind == "memory":
+        return BoundedMemorySaver(max_threads=max_threads, ttl_seconds=ttl_seconds)
+    raise ValueError(f"Unknown CHECKPOINTER '{kind}' (expected 'memory' or 'sqlite')")
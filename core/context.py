@@ -0,0 +1,134 @@
+import json
+import os
+import re
+
+from core.vector_store import estimate_tokens
+
+# Tokens reserved for the tool output of one medical_search_tool call
+DEFAULT_RESULT_TOKEN_BUDGET = 1200
+# Below this many content tokens a hit is dropped rather than cut to a stub
+MIN_HIT_TOKENS = 30
+
+# Chunk text starts with "DATE: ... | " which the citation header already carries
+LEADING_DATE_RE = re.compile(r"^DATE:\s*[^|]*\|\s*")
+
+
+def _normalized(text):
+    return re.sub(r"\s+", " ", text).strip().casefold()
+
+
+def dedupe_hits(hits):
+    """
+    Drop hits that repeat another hit: same id, or same source and date with
+    text equal to or contained in a higher-ranked hit.
+    """
+    kept = []
+    seen_ids = set()
+    for hit in hits:
+        if hit.id in seen_ids:
+            continue
+        payload = hit.payload
+        text = _normalized(payload.get("text", ""))
+        source = (payload.get("event_type"), payload.get("timestamp"))
+        if any(
+            source == (k.payload.get("event_type"), k.payload.get("timestamp"))
+            and text in _normalized(k.payload.get("text", ""))
+            for k in kept
+        ):
+            continue
+        seen_ids.add(hit.id)
+        kept.append(hit)
+    return kept
+
+
+def trim_text(text, max_tokens):
+    """Cut text to roughly `max_tokens`, at a word boundary, marking the cut."""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    cut = text[: max(max_tokens - 1, 0) * 3].rsplit(" ", 1)[0].rstrip(" |,;")
+    return f"{cut} …"
+
+
+def assemble_search_context(hits, token_budget=None):
+    """
+    Format search hits for the LLM within a token budget.
+
+    Hits are de-duplicated, the date already shown in each citation header is
+    removed from the content, and the budget is shared across hits in rank
+    order (a short hit leaves its unused share to the ones after it). Every
+    hit that is kept keeps its Source and Date citation.
+    """
+    if token_budget is None:
+        token_budget = int(
+            os.getenv("TOOL_RESULT_TOKEN_BUDGET", str(DEFAULT_RESULT_TOKEN_BUDGET))
+        )
+    hits = dedupe_hits(hits)
+    if not hits:
+        return "No relevant records found for this query."
+
+    formatted = []
+    remaining = token_budget
+    for i, hit in enumerate(hits):
+        event_type = hit.payload.get("event_type", "record")
+        header = f"Source: {event_type.capitalize()}\nDate: {hit.payload['timestamp']}"
+        share = remaining // (len(hits) - i) - estimate_tokens(header)
+        if share < MIN_HIT_TOKENS and formatted:
+            formatted.append(f"({len(hits) - i} more matching records omitted)")
+            break
+        content = LEADING_DATE_RE.sub("", hit.payload["text"])
+        content = trim_text(content, max(share, MIN_HIT_TOKENS))
+        entry = f"{header}\nContent: {content}"
+        remaining -= estimate_tokens(entry)
+        formatted.append(entry)
+
+    return "\n\n---\n\n".join(formatted)
+
+
+def compact_identity(demographics, medical_history):
+    """Identity context as minified JSON without empty fields."""
+    identity = {
+        "demographics": demographics,
+        "medical_history": medical_history,
+    }
+    identity = {
+        section: {k: v for k, v in fields.items() if v not in (None, "", [])}
+        for section, fields in identity.items()
+    }
+    return json.dumps(identity, ensure_ascii=False, separators=(",", ":"))
+
+
+class TurnTokens:
+    """
+    Token counts for one chat turn: prompt and completion tokens as reported
+    by the model (summed over every model call in the turn), plus an estimate
+    of how much of the prompt came from tool output.
+    """
+
+    def __init__(self):
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.tool_tokens = 0
+        self.model_calls = 0
+
+    def add_message(self, message):
+        usage = getattr(message, "usage_metadata", None) or {}
+        self.input_tokens += usage.get("input_tokens", 0)
+        self.output_tokens += usage.get("output_tokens", 0)
+        self.model_calls += 1
+
+    def add_tool_output(self, text):
+        self.tool_tokens += estimate_tokens(text)
+
+    def as_dict(self):
+        return {
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+            "tool_tokens": self.tool_tokens,
+            "model_calls": self.model_calls,
+        }
+
+    def __str__(self):
+        return (
+            f"{self.input_tokens} prompt + {self.output_tokens} completion tokens "
+            f"over {self.model_calls} model call(s); tool results ≈ {self.tool_tokens}"
+        )
@@ -0,0 +1,127 @@
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from array import array
+from collections import OrderedDict
+
+
+def normalize_query(query):
+    """Canonical form used for cache keys: NFKC, case-folded, single-spaced."""
+    text = unicodedata.normalize("NFKC", query).casefold()
+    text = re.sub(r"\s+", " ", text).strip()
+    return text.strip("¿?¡!.,;: ")
+
+
+class QueryEmbeddingCache:
+    """
+    Two-tier cache for query embeddings.
+
+    Tier 1 is an in-process LRU; tier 2 is an optional SQLite file shared across
+    processes and restarts, capped at `max_disk_entries` rows with the least
+    recently used evicted first. Keys combine the normalized query with the model
+    and output dimension, so changing either never returns a stale vector.
+    """
+
+    def __init__(self, max_entries=1024, path=None, max_disk_entries=100_000):
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self.path = path
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS query_embeddings "
+                "(key TEXT PRIMARY KEY, vector BLOB NOT NULL, "
+                "last_used REAL NOT NULL DEFAULT 0)"
+            )
+            info = self._db.execute("PRAGMA table_info(query_embeddings)")
+            columns = {row[1] for row in info}
+            if "last_used" not in columns:
+                # Files written before the cap existed; their rows go first
+                self._db.execute(
+                    "ALTER TABLE query_embeddings "
+                    "ADD COLUMN last_used REAL NOT NULL DEFAULT 0"
+                )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS query_embeddings_last_used "
+                "ON query_embeddings (last_used)"
+            )
+            self._db.commit()
+
+    @staticmethod
+    def make_key(query, model, dimension):
+        return f"{model}|{dimension}|{normalize_query(query)}"
+
+    def _remember(self, key, embedding):
+        self._memory[key] = embedding
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, query, model, dimension):
+        key = self.make_key(query, model, dimension)
+        with self._lock:
+            embedding = self._memory.get(key)
+            if embedding is not None:
+                self._memory.move_to_end(key)
+                self._stats["memory_hits"] += 1
+                return embedding
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT vector FROM query_embeddings WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    self._db.execute(
+                        "UPDATE query_embeddings SET last_used = ? WHERE key = ?",
+                        (time.time(), key),
+                    )
+                    self._db.commit()
+                    embedding = array("f", row[0]).tolist()
+                    self._remember(key, embedding)
+                    self._stats["disk_hits"] += 1
+                    return embedding
+
+            self._stats["misses"] += 1
+            return None
+
+    def put(self, query, model, dimension, embedding):
+        key = self.make_key(query, model, dimension)
+        with self._lock:
+            self._remember(key, list(embedding))
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO query_embeddings (key, vector, last_used) "
+                    "VALUES (?, ?, ?)",
+                    (key, array("f", embedding).tobytes(), time.time()),
+                )
+                self._prune_disk()
+                self._db.commit()
+
+    def _prune_disk(self):
+        # Oldest-first down to the cap; the file is shared, so count every row
+        (count,) = self._db.execute("SELECT COUNT(*) FROM query_embeddings").fetchone()
+        excess = count - self.max_disk_entries
+        if excess > 0:
+            self._db.execute(
+                "DELETE FROM query_embeddings WHERE key IN "
+                "(SELECT key FROM query_embeddings ORDER BY last_used LIMIT ?)",
+                (excess,),
+            )
+
+    def stats(self):
+        with self._lock:
+            hits = self._stats["memory_hits"] + self._stats["disk_hits"]
+            lookups = hits + self._stats["misses"]
+            return {
+                **self._stats,
+                "hits": hits,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "memory_entries": len(self._memory),
+            }
@@ -0,0 +1,171 @@
+import os
+import uuid
+import threading
+from collections import OrderedDict
+from urllib.parse import quote, unquote
+import numpy as np
+from utils.narrative import normalize_analyte
+
+# Common Spanish/English synonyms mapped to the key used in the records
+ANALYTE_ALIASES = {
+    "glucosa": "glucose",
+    "glucemia": "glucose",
+    "creatinina": "creatinine",
+    "hemoglobina_glicosilada": "hba1c",
+    "hemoglobina_glucosilada": "hba1c",
+    "a1c": "hba1c",
+    "colesterol": "cholesterol",
+    "trigliceridos": "triglycerides",
+    "potasio": "potassium",
+    "sodio": "sodium",
+    "hemoglobina": "hemoglobin",
+}
+
+
+class LabStore:
+    """
+    Columnar per-patient store of numeric lab results.
+
+    Each patient is one `.npz` file with parallel arrays (analyte, date,
+    value, unit, raw, test) sorted by analyte then date, plus the start
+    offset of every analyte. A trend lookup is a binary search on the
+    analyte column and a slice, with no embedding or vector query involved.
+    """
+
+    COLUMNS = ("analyte", "date", "value", "unit", "raw", "test")
+
+    def __init__(self, path=None, max_cached_patients=None):
+        self.root = path or os.getenv("LAB_STORE_PATH", "lab_store")
+        os.makedirs(self.root, exist_ok=True)
+        # LRU of loaded patients, so a long-running app over many patients
+        # keeps only the recently used series in memory
+        self.max_cached_patients = max_cached_patients or int(
+            os.getenv("LAB_STORE_CACHE_SIZE") or 256
+        )
+        self._cache = OrderedDict()  # patient file -> (mtime_ns, columns)
+        self._lock = threading.Lock()
+
+    def _patient_path(self, patient_id):
+        return os.path.join(self.root, f"{quote(str(patient_id), safe='')}.npz")
+
+    def write_patient(self, patient_id, observations):
+        """Replace a patient's lab series with `observations` (see utils.narrative)."""
+        path = self._patient_path(patient_id)
+        if not observations:
+            self.delete_patient(patient_id)
+            return
+
+        rows = sorted(observations, key=lambda o: (o["analyte"], o["date"]))
+        analytes = np.array([o["analyte"] for o in rows])
+        names, starts = np.unique(analytes, return_index=True)
+        columns = {
+            "analyte": analytes,
+            "date": np.array([o["date"][:10] for o in rows], dtype="datetime64[D]"),
+            "value": np.array(
+                [np.nan if o["value"] is None else o["value"] for o in rows],
+                dtype=np.float64,
+            ),
+            "unit": np.array([o["unit"] for o in rows]),
+            "raw": np.array([o["raw"] for o in rows]),
+            "test": np.array([o["test"] for o in rows]),
+            "analyte_names": names,
+            "analyte_starts": np.append(starts, len(rows)),
+        }
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp.npz"
+        np.savez(tmp_path, **columns)
+        os.replace(tmp_path, path)
+
+    def delete_patient(self, patient_id):
+        path = self._patient_path(patient_id)
+        with self._lock:
+            self._cache.pop(path, None)
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def patient_ids(self):
+        return {
+            unquote(name[: -len(".npz")])
+            for name in os.listdir(self.root)
+            if name.endswith(".npz") and ".tmp" not in name
+        }
+
+    def _load(self, patient_id):
+        path = self._patient_path(patient_id)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            cached = self._cache.get(path)
+            if cached is not None and cached[0] == mtime:
+                self._cache.move_to_end(path)
+                return cached[1]
+        with np.load(path) as data:
+            columns = {key: data[key] for key in data.files}
+        with self._lock:
+            self._cache[path] = (mtime, columns)
+            self._cache.move_to_end(path)
+            while len(self._cache) > self.max_cached_patients:
+                self._cache.popitem(last=False)
+        return columns
+
+    def analytes(self, patient_id):
+        columns = self._load(patient_id)
+        return [] if columns is None else columns["analyte_names"].tolist()
+
+    def resolve_analyte(self, patient_id, name):
+        """Map a user/LLM analyte name to a stored analyte key, or None."""
+        available = self.analytes(patient_id)
+        key = normalize_analyte(name)
+        for candidate in (key, ANALYTE_ALIASES.get(key)):
+            if candidate in available:
+                return candidate
+        # Partial match, e.g. "glucose" -> "glucose_fasting"
+        matches = [a for a in available if key and (key in a or a in key)]
+        return matches[0] if len(matches) == 1 else None
+
+    def series(self, patient_id, analyte, date_from=None, date_to=None):
+        """Chronological observations of one analyte as a list of dicts."""
+        columns = self._load(patient_id)
+        if columns is None:
+            return []
+        names = columns["analyte_names"]
+        i = np.searchsorted(names, analyte)
+        if i >= len(names) or names[i] != analyte:
+            return []
+        start, end = columns["analyte_starts"][i], columns["analyte_starts"][i + 1]
+
+        dates = columns["date"][start:end]
+        mask = np.ones(len(dates), dtype=bool)
+        if date_from:
+            mask &= dates >= np.datetime64(date_from, "D")
+        if date_to:
+            mask &= dates <= np.datetime64(date_to, "D")
+        rows = np.flatnonzero(mask) + start
+
+        return [
+            {
+                "date": str(columns["date"][r]),
+                "value": None if np.isnan(columns["value"][r]) else float(columns["value"][r]),
+                "unit": str(columns["unit"][r]),
+                "raw": str(columns["raw"][r]),
+                "test": str(columns["test"][r]),
+            }
+            for r in rows
+        ]
+
+    def summary(self, patient_id, analyte, date_from=None, date_to=None):
+        """Latest value plus min/max/delta over the numeric observations."""
+        points = self.series(patient_id, analyte, date_from, date_to)
+        if not points:
+            return None
+        numeric = [p for p in points if p["value"] is not None]
+        result = {"count": len(points), "latest": points[-1]}
+        if numeric:
+            result["min"] = min(numeric, key=lambda p: p["value"])
+            result["max"] = max(numeric, key=lambda p: p["value"])
+            result["first"] = numeric[0]
+            result["delta"] = numeric[-1]["value"] - numeric[0]["value"]
+        return result
@@ -0,0 +1,103 @@
+import re
+import math
+import zlib
+import unicodedata
+from collections import Counter
+
+# BM25 parameters. Chunks are single visit/lab lines, so a fixed average
+# document length is a good enough stand-in for corpus statistics.
+BM25_K1 = 1.2
+BM25_B = 0.75
+BM25_AVG_DOC_TOKENS = 40
+
+# Reciprocal-rank fusion constant (the usual k=60 from the RRF paper)
+RRF_K = 60
+
+STOPWORDS = {
+    # Spanish
+    "a", "al", "con", "de", "del", "el", "en", "es", "la", "las", "lo", "los",
+    "para", "por", "que", "se", "su", "sus", "un", "una", "y", "o",
+    # English
+    "an", "and", "for", "in", "is", "of", "on", "or", "the", "to", "with",
+    # Narrative field labels emitted by utils.narrative
+    "date", "doctor", "reason", "notes", "test", "result",
+}
+
+TOKEN_RE = re.compile(r"[a-z0-9]+(?:[.,][0-9]+)?")
+
+
+def tokenize(text):
+    """Accent-insensitive, lowercase tokens; decimals like `7.2` stay whole."""
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(c for c in text if not unicodedata.combining(c)).lower()
+    return [
+        token.replace(",", ".")
+        for token in TOKEN_RE.findall(text)
+        if token not in STOPWORDS
+    ]
+
+
+def term_id(token):
+    """Stable uint32 term index for sparse vectors."""
+    return zlib.crc32(token.encode("utf-8"))
+
+
+def bm25_tf(tf, doc_len):
+    return tf * (BM25_K1 + 1) / (
+        tf + BM25_K1 * (1 - BM25_B + BM25_B * doc_len / BM25_AVG_DOC_TOKENS)
+    )
+
+
+def document_sparse_vector(text):
+    """
+    BM25 term-frequency weights for a document as (indices, values).
+    IDF is applied by the search engine at query time.
+    """
+    tokens = tokenize(text)
+    counts = Counter(tokens)
+    indices = [term_id(token) for token in counts]
+    values = [bm25_tf(tf, len(tokens)) for tf in counts.values()]
+    return indices, values
+
+
+def query_sparse_vector(text):
+    """Unit weight per distinct query term as (indices, values)."""
+    terms = sorted(set(tokenize(text)))
+    return [term_id(term) for term in terms], [1.0] * len(terms)
+
+
+def is_exact_term_query(query):
+    """
+    True for single-term lookups ("hba1c", "creatinina", "Losartán", "128")
+    that lexical search answers on its own, without an embedding call.
+    """
+    tokens = tokenize(query)
+    return len(tokens) == 1 and (len(tokens[0]) >= 3 or tokens[0][0].isdigit())
+
+
+def bm25_scores(query_terms, documents):
+    """
+    BM25 scores of tokenized `documents` for `query_terms`, using IDF from
+    the documents themselves (used by the local backend per partition).
+    """
+    n = len(documents)
+    counts = [Counter(tokens) for tokens in documents]
+    scores = [0.0] * n
+    for term in set(query_terms):
+        df = sum(1 for c in counts if term in c)
+        if not df:
+            continue
+        idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+        for i, c in enumerate(counts):
+            if term in c:
+                scores[i] += idf * bm25_tf(c[term], len(documents[i]))
+    return scores
+
+
+def rrf_fuse(rankings, limit):
+    """Reciprocal-rank fusion of several ranked ID lists; returns (id, score) pairs."""
+    fused = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking):
+            fused[item] = fused.get(item, 0.0) + 1.0 / (RRF_K + rank + 1)
+    return sorted(fused.items(), key=lambda x: x[1], reverse=True)[:limit]
@@ -0,0 +1,170 @@
+import os
+import json
+import time
+import uuid
+import threading
+import unicodedata
+from functools import lru_cache
+
+
+def _fold(text):
+    """Case- and accent-insensitive form for type-ahead matching."""
+    text = unicodedata.normalize("NFKD", str(text))
+    return "".join(c for c in text if not unicodedata.combining(c)).casefold()
+
+
+class PatientRegistry:
+    """
+    Index of the patient files in `data_dir`.
+
+    A compact manifest (id, display name, filename, mtime) is persisted next to
+    the data and updated incrementally: only files whose mtime changed are
+    parsed again. Refreshes are skipped while the directory is unchanged and
+    the last scan is younger than `refresh_interval` seconds, so a Streamlit
+    rerun costs a `stat` instead of parsing every file. Full records are
+    loaded lazily through an LRU cache keyed by file and mtime; treat them as
+    read-only.
+    """
+
+    def __init__(
+        self, data_dir="data", manifest_path=None, cache_size=None, refresh_interval=None
+    ):
+        self.data_dir = data_dir
+        self.manifest_path = manifest_path or os.getenv(
+            "PATIENT_MANIFEST_PATH", os.path.join(data_dir, ".patient_manifest.json")
+        )
+        self.refresh_interval = float(
+            refresh_interval
+            if refresh_interval is not None
+            else os.getenv("PATIENT_REGISTRY_REFRESH_SECONDS", "30")
+        )
+        self._lock = threading.Lock()
+        self._entries = self._read_manifest()  # filename -> entry
+        self._by_id = {}
+        self._sorted = []
+        self._dir_mtime = None
+        self._last_scan = 0.0
+        self._reindex()
+        self._read_record = lru_cache(
+            maxsize=int(cache_size or os.getenv("PATIENT_CACHE_SIZE", "256"))
+        )(self._read_record_uncached)
+
+    def _read_manifest(self):
+        try:
+            with open(self.manifest_path, "r") as f:
+                return {entry["filename"]: entry for entry in json.load(f)}
+        except (FileNotFoundError, ValueError, KeyError):
+            return {}
+
+    def _write_manifest(self):
+        tmp_path = f"{self.manifest_path}.{uuid.uuid4().hex}.tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump(
+                    [
+                        {k: v for k, v in e.items() if not k.startswith("_")}
+                        for e in self._entries.values()
+                    ],
+                    f,
+                    ensure_ascii=False,
+                )
+            os.replace(tmp_path, self.manifest_path)
+        except OSError:
+            # A read-only data directory still works, just without persistence
+            pass
+
+    def _reindex(self):
+        self._by_id = {entry["id"]: entry for entry in self._entries.values()}
+        self._sorted = sorted(self._entries.values(), key=lambda e: e["display"])
+        for entry in self._sorted:
+            entry["_search"] = _fold(entry["display"])
+
+    def refresh(self, force=False):
+        """Re-scan `data_dir` if it changed; only modified files are parsed."""
+        dir_mtime = os.stat(self.data_dir).st_mtime_ns
+        now = time.monotonic()
+        if (
+            not force
+            and dir_mtime == self._dir_mtime
+            and now - self._last_scan < self.refresh_interval
+        ):
+            return False
+
+        with self._lock:
+            changed = False
+            seen = set()
+            for dir_entry in os.scandir(self.data_dir):
+                filename = dir_entry.name
+                # Hidden files (e.g. this registry's own manifest) are not patients
+                if (
+                    not filename.endswith(".json")
+                    or filename == "example.json"
+                    or filename.startswith(".")
+                ):
+                    continue
+                seen.add(filename)
+                mtime = dir_entry.stat().st_mtime_ns
+                cached = self._entries.get(filename)
+                if cached is not None and cached["mtime"] == mtime:
+                    continue
+                try:
+                    with open(dir_entry.path, "r") as f:
+                        data = json.load(f)
+                except (OSError, ValueError):
+                    continue
+                if not isinstance(data, dict):
+                    continue
+                name = data.get("demographics", {}).get("name", "Unknown")
+                p_id = data.get("patient_id", "No ID")
+                self._entries[filename] = {
+                    "id": p_id,
+                    "display": f"{name} - {p_id}",
+                    "filename": filename,
+                    "mtime": mtime,
+                }
+                changed = True
+
+            for filename in set(self._entries) - seen:
+                del self._entries[filename]
+                changed = True
+
+            if changed or not os.path.exists(self.manifest_path):
+                self._reindex()
+                self._write_manifest()
+            self._dir_mtime = dir_mtime
+            self._last_scan = now
+            return changed
+
+    def __len__(self):
+        return len(self._sorted)
+
+    def search(self, text="", offset=0, limit=50):
+        """
+        Type-ahead search over display names and IDs.
+
+        Returns:
+            (page of manifest entries, total number of matches)
+        """
+        needle = _fold(text.strip())
+        matches = (
+            [e for e in self._sorted if needle in e["_search"]] if needle else self._sorted
+        )
+        page = [
+            {k: v for k, v in e.items() if not k.startswith("_")}
+            for e in matches[offset : offset + limit]
+        ]
+        return page, len(matches)
+
+    def get(self, patient_id):
+        return self._by_id.get(patient_id)
+
+    def _read_record_uncached(self, filename, mtime):
+        with open(os.path.join(self.data_dir, filename), "r") as f:
+            return json.load(f)
+
+    def load(self, patient_id):
+        """Full patient record (cached until the file's mtime changes)."""
+        entry = self.get(patient_id)
+        if entry is None:
+            return None
+        return self._read_record(entry["filename"], entry["mtime"])
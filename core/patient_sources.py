@@ -0,0 +1,64 @@
+import os
+import sqlite3
+
+# Source of the patients ingested from the data/ directory; NDJSON exports
+# are recorded by their absolute path
+DATA_DIR_SOURCE = "data/"
+
+
+class PatientSources:
+    """
+    Which ingestion source (the data/ directory or an NDJSON export) each
+    indexed patient came from.
+
+    Ingestion only prunes patients, and their lab series, within the source
+    it is reading, so a data/ sync never deletes patients loaded from an
+    export. Backed by a small SQLite file next to the other ingestion state.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or os.getenv("PATIENT_SOURCES_PATH", "patient_sources.sqlite")
+        self._db = sqlite3.connect(self.path)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS patient_sources "
+            "(patient_id TEXT PRIMARY KEY, source TEXT NOT NULL)"
+        )
+        self._db.commit()
+
+    def record(self, patient_ids, source):
+        """Mark `patient_ids` as coming from `source` (a patient may move)."""
+        self._db.executemany(
+            "INSERT INTO patient_sources (patient_id, source) VALUES (?, ?) "
+            "ON CONFLICT(patient_id) DO UPDATE SET source = excluded.source",
+            [(patient_id, source) for patient_id in patient_ids],
+        )
+        self._db.commit()
+
+    def forget(self, patient_ids):
+        self._db.executemany(
+            "DELETE FROM patient_sources WHERE patient_id = ?",
+            [(patient_id,) for patient_id in patient_ids],
+        )
+        self._db.commit()
+
+    def patient_ids(self, source=None):
+        """Patients recorded for `source`, or for any source if None."""
+        if source is None:
+            rows = self._db.execute("SELECT patient_id FROM patient_sources")
+        else:
+            rows = self._db.execute(
+                "SELECT patient_id FROM patient_sources WHERE source = ?", (source,)
+            )
+        return {patient_id for (patient_id,) in rows}
+
+    def other_sources(self, source):
+        """{other source: patient IDs} for every source but `source`."""
+        others = {}
+        rows = self._db.execute(
+            "SELECT source, patient_id FROM patient_sources WHERE source != ?",
+            (source,),
+        )
+        for other, patient_id in rows:
+            others.setdefault(other, set()).add(patient_id)
+        return others
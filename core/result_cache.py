@@ -0,0 +1,134 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from core.embedding_cache import normalize_query
+
+ALL_PATIENTS = "*"
+
+
+class DataVersions:
+    """
+    Per-patient data versions shared between ingestion and the app.
+
+    Ingestion bumps a patient's version whenever its indexed chunks change
+    (and the global version on a full rebuild); cached tool results remember
+    the version they were computed against and are dropped once it moves.
+    Backed by a small SQLite file so separate processes see each other's bumps.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or os.getenv("DATA_VERSIONS_PATH", "data_versions.sqlite")
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS data_versions "
+            "(patient_id TEXT PRIMARY KEY, version INTEGER NOT NULL)"
+        )
+        self._db.commit()
+
+    def get(self, patient_id):
+        """(global version, patient version); 0 for anything never bumped."""
+        with self._lock:
+            rows = dict(
+                self._db.execute(
+                    "SELECT patient_id, version FROM data_versions "
+                    "WHERE patient_id IN (?, ?)",
+                    (ALL_PATIENTS, patient_id),
+                ).fetchall()
+            )
+        return rows.get(ALL_PATIENTS, 0), rows.get(patient_id, 0)
+
+    def bump(self, patient_ids):
+        patient_ids = list(patient_ids)
+        if not patient_ids:
+            return
+        with self._lock:
+            self._db.executemany(
+                "INSERT INTO data_versions (patient_id, version) VALUES (?, 1) "
+                "ON CONFLICT(patient_id) DO UPDATE SET version = version + 1",
+                [(patient_id,) for patient_id in patient_ids],
+            )
+            self._db.commit()
+
+    def bump_all(self):
+        """Invalidate every patient at once (e.g. after a full rebuild)."""
+        self.bump([ALL_PATIENTS])
+
+
+class ToolResultCache:
+    """
+    LRU + TTL cache of formatted medical_search_tool output.
+
+    Keys are (patient_id, normalized query, event_type, order_by_date, limit,
+    date_from, date_to). An entry is served only while it is younger than
+    `ttl_seconds` and the patient's data version is unchanged.
+    """
+
+    def __init__(self, versions, max_entries=512, ttl_seconds=900):
+        self.versions = versions
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()  # key -> (version, stored_at, result)
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "stale": 0}
+
+    @staticmethod
+    def make_key(search):
+        return (
+            search["patient_id"],
+            normalize_query(search["query"]),
+            search.get("event_type"),
+            bool(search.get("order_by_date")),
+            search.get("limit"),
+            search.get("date_from"),
+            search.get("date_to"),
+        )
+
+    def get(self, search):
+        """
+        (cached result or None, current data version) for a search dict. Pass
+        the version back to `put` so a result computed while ingestion bumped
+        the patient is stored under the old version and never served.
+        """
+        if self.max_entries <= 0:
+            return None, None
+        key = self.make_key(search)
+        version = self.versions.get(search["patient_id"])
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry_version, stored_at, result = entry
+                if (
+                    entry_version == version
+                    and time.monotonic() - stored_at < self.ttl_seconds
+                ):
+                    self._entries.move_to_end(key)
+                    self._stats["hits"] += 1
+                    return result, version
+                del self._entries[key]
+                self._stats["stale"] += 1
+            self._stats["misses"] += 1
+            return None, version
+
+    def put(self, search, version, result):
+        if self.max_entries <= 0:
+            return
+        key = self.make_key(search)
+        with self._lock:
+            self._entries[key] = (version, time.monotonic(), result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                **self._stats,
+                "hit_rate": self._stats["hits"] / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+            }
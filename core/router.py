@@ -0,0 +1,150 @@
+import os
+
+from core import telemetry
+from core.context import LEADING_DATE_RE
+from core.lexical import tokenize
+
+NOT_FOUND = "No encontré esa información en los registros disponibles."
+
+# Question words and politeness that carry no intent (accent-folded tokens;
+# articles and prepositions are already dropped by the tokenizer)
+FILLER = {
+    "cual", "cuales", "son", "fue", "fueron", "era", "hay", "tiene", "tuvo",
+    "toma", "dame", "dime", "muestrame", "mostrar", "muestra", "ver", "lista",
+    "listar", "listado", "paciente", "este", "esta", "mi", "mis", "le", "favor",
+    "registrada", "registradas", "registrado", "registrados", "actual",
+    "actuales", "what", "are", "was", "were", "does", "has", "have", "show",
+    "me", "list", "patient", "s", "his", "her", "their", "current", "please",
+}
+LATEST = {
+    "ultima", "ultimo", "ultimas", "ultimos", "reciente", "mas", "cuando", "fecha",
+    "last", "latest", "most", "recent", "when",
+}
+
+# Intent -> (vocabulary that must appear, extra vocabulary allowed with it)
+INTENTS = {
+    "latest_visit": ({"visita", "consulta", "visit", "appointment"}, LATEST),
+    "latest_lab": (
+        {
+            "laboratorio", "laboratorios", "lab", "labs", "analisis", "analitica",
+            "estudios", "resultados", "results",
+        },
+        LATEST,
+    ),
+    "allergies": ({"alergias", "alergia", "alergico", "alergica", "allergies"}, set()),
+    "medications": (
+        {
+            "medicacion", "medicaciones", "medicamentos", "medicamento", "farmacos",
+            "tratamiento", "medications", "medication", "meds",
+        },
+        set(),
+    ),
+    "conditions": (
+        {
+            "condiciones", "enfermedades", "diagnosticos", "antecedentes", "cronicas",
+            "cronicos", "conditions", "diagnoses", "chronic",
+        },
+        {"cronicas", "cronicos", "chronic"},
+    ),
+}
+
+
+class QueryRouter:
+    """
+    Rule-based fast path in front of the agent for simple record lookups
+    ("última visita", "último laboratorio", "lista de alergias", ...).
+
+    A question is routed only when every meaningful word belongs to exactly
+    one intent, so anything with a qualifier (a drug name, a date, a second
+    topic) falls back to the agent. Routed answers come from the identity
+    context or one date-ordered index lookup, with the same citations the
+    agent gives, and cost no LLM call.
+    """
+
+    def __init__(self, vector_store):
+        self.vector_store = vector_store
+        self.enabled = os.getenv("FAST_PATH_ROUTER", "true").lower() == "true"
+
+    def classify(self, question):
+        """The intent of `question`, or None if it is not a plain lookup."""
+        words = set(tokenize(question)) - FILLER
+        if not words:
+            return None
+        matches = [
+            intent
+            for intent, (required, extra) in INTENTS.items()
+            if words & required and words <= required | extra
+        ]
+        if len(matches) != 1:
+            return None
+        intent = matches[0]
+        # "visita" alone is ambiguous (which one?); only the latest is a lookup
+        if intent.startswith("latest_") and not words & LATEST:
+            return None
+        return intent
+
+    def route(self, question, patient_id, medical_history):
+        """
+        Answer `question` directly if it is a plain lookup.
+
+        Returns:
+            {"intent", "answer"} or None to hand the question to the agent.
+        """
+        if not self.enabled:
+            return None
+        intent = self.classify(question)
+        if intent is None:
+            return None
+        with telemetry.span("router", intent=intent):
+            if intent == "latest_visit":
+                answer = self._latest(patient_id, "visit")
+            elif intent == "latest_lab":
+                answer = self._latest(patient_id, "lab")
+            else:
+                answer = self._identity_answer(intent, medical_history)
+        telemetry.count("routed_turns", intent=intent)
+        return {"intent": intent, "answer": answer}
+
+    def _latest(self, patient_id, event_type):
+        """Most recent record(s) of a type; labs drawn the same day are grouped."""
+        hits = self.vector_store.search(
+            "", patient_id, limit=5, event_type=event_type, order_by_date=True
+        )
+        if not hits:
+            return NOT_FOUND
+        date = hits[0].payload["timestamp"]
+        label = "visita" if event_type == "visit" else "laboratorio"
+        lines = [
+            f"- {LEADING_DATE_RE.sub('', hit.payload['text'])}"
+            for hit in hits
+            if hit.payload["timestamp"] == date
+        ]
+        if event_type == "visit":
+            lines = lines[:1]
+        return f"Según {label} del {date}:\n" + "\n".join(lines)
+
+    @staticmethod
+    def _identity_answer(intent, medical_history):
+        source = "Según el contexto de identidad del paciente"
+        if intent == "allergies":
+            allergies = medical_history.get("allergies") or []
+            if not allergies:
+                return f"{source}, no hay alergias registradas."
+            return f"{source}, alergias registradas: {', '.join(allergies)}."
+        if intent == "medications":
+            medications = medical_history.get("current_medications") or []
+            if not medications:
+                return f"{source}, no hay medicación actual registrada."
+            lines = []
+            for medication in medications:
+                line = " ".join(
+                    str(medication[k]) for k in ("name", "dose") if medication.get(k)
+                )
+                if medication.get("frequency"):
+                    line += f" ({medication['frequency']})"
+                lines.append(f"- {line}")
+            return f"{source}, medicación actual:\n" + "\n".join(lines)
+        conditions = medical_history.get("chronic_conditions") or []
+        if not conditions:
+            return f"{source}, no hay condiciones crónicas registradas."
+        return f"{source}, condiciones crónicas: {', '.join(conditions)}."
@@ -0,0 +1,198 @@
+import contextvars
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+# Upper bounds (ms) of the latency histogram buckets
+LATENCY_BUCKETS_MS = (
+    1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000,
+)
+METRIC_PREFIX = "clinical_assistant"
+
+logger = logging.getLogger("clinical_assistant.telemetry")
+LOG_TRACES = os.getenv("TELEMETRY_LOG", "false").lower() == "true"
+if LOG_TRACES and not logger.handlers:
+    handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+class Metrics:
+    """
+    Process-wide counters and latency histograms, exportable in the
+    Prometheus text exposition format.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = defaultdict(float)  # (name, labels) -> value
+        self._histograms = {}  # (name, labels) -> [bucket counts, sum, count]
+
+    def inc(self, name, value=1, **labels):
+        with self._lock:
+            self._counters[(name, _label_key(labels))] += value
+
+    def observe(self, name, value_ms, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = [[0] * len(LATENCY_BUCKETS_MS), 0.0, 0]
+                self._histograms[key] = histogram
+            for i, bound in enumerate(LATENCY_BUCKETS_MS):
+                if value_ms <= bound:
+                    histogram[0][i] += 1
+            histogram[1] += value_ms
+            histogram[2] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "counters": [
+                    {"name": name, "labels": dict(labels), "value": value}
+                    for (name, labels), value in self._counters.items()
+                ],
+                "histograms": [
+                    {
+                        "name": name,
+                        "labels": dict(labels),
+                        "count": count,
+                        "sum_ms": total,
+                    }
+                    for (name, labels), (_, total, count) in self._histograms.items()
+                ],
+            }
+
+    def render_prometheus(self):
+        def fmt_labels(labels, extra=()):
+            pairs = [f'{k}="{v}"' for k, v in (*labels, *extra)]
+            return "{" + ",".join(pairs) + "}" if pairs else ""
+
+        lines = []
+        with self._lock:
+            for name in sorted({name for name, _ in self._counters}):
+                lines.append(f"# TYPE {METRIC_PREFIX}_{name} counter")
+                for (metric, labels), value in self._counters.items():
+                    if metric == name:
+                        lines.append(
+                            f"{METRIC_PREFIX}_{name}{fmt_labels(labels)} {value:g}"
+                        )
+            for name in sorted({name for name, _ in self._histograms}):
+                lines.append(f"# TYPE {METRIC_PREFIX}_{name} histogram")
+                for (metric, labels), histogram in self._histograms.items():
+                    if metric != name:
+                        continue
+                    buckets, total, count = histogram
+                    full_name = f"{METRIC_PREFIX}_{name}"
+                    for bound, bucket_count in zip(LATENCY_BUCKETS_MS, buckets):
+                        le = fmt_labels(labels, [("le", f"{bound:g}")])
+                        lines.append(f"{full_name}_bucket{le} {bucket_count}")
+                    le = fmt_labels(labels, [("le", "+Inf")])
+                    lines.append(f"{full_name}_bucket{le} {count}")
+                    lines.append(f"{full_name}_sum{fmt_labels(labels)} {total:g}")
+                    lines.append(f"{full_name}_count{fmt_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+
+class Trace:
+    """Spans and counters recorded while handling one request (e.g. a chat turn)."""
+
+    def __init__(self, name):
+        self.name = name
+        self.started_at = time.time()
+        self.total_ms = 0.0
+        self.spans = []  # (name, ms, attrs)
+        self.counters = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def add_span(self, name, ms, attrs):
+        with self._lock:
+            self.spans.append((name, ms, attrs))
+
+    def count(self, name, value=1):
+        with self._lock:
+            self.counters[name] += value
+
+    def breakdown(self):
+        """Total ms and call count per span name, in first-seen order."""
+        totals = {}
+        with self._lock:
+            for name, ms, _ in self.spans:
+                entry = totals.setdefault(name, {"ms": 0.0, "count": 0})
+                entry["ms"] += ms
+                entry["count"] += 1
+        return totals
+
+    def as_dict(self):
+        return {
+            "trace": self.name,
+            "started_at": self.started_at,
+            "total_ms": round(self.total_ms, 3),
+            "spans": {
+                name: {"ms": round(entry["ms"], 3), "count": entry["count"]}
+                for name, entry in self.breakdown().items()
+            },
+            "counters": dict(self.counters),
+        }
+
+
+_current_trace = contextvars.ContextVar("telemetry_trace", default=None)
+
+
+def current_trace():
+    return _current_trace.get()
+
+
+@contextmanager
+def start_trace(name):
+    """
+    Collect every span and counter recorded in this context into a new Trace.
+    The finished trace is observed as `<name>_latency_ms` and, with
+    TELEMETRY_LOG=true, logged as one JSON line.
+    """
+    trace = Trace(name)
+    token = _current_trace.set(trace)
+    started = time.perf_counter()
+    try:
+        yield trace
+    finally:
+        trace.total_ms = (time.perf_counter() - started) * 1000
+        _current_trace.reset(token)
+        metrics.observe(f"{name}_latency_ms", trace.total_ms)
+        if LOG_TRACES:
+            logger.info(json.dumps(trace.as_dict(), ensure_ascii=False))
+
+
+@contextmanager
+def span(name, **attrs):
+    """Time a block into the `span_latency_ms` histogram and the current trace."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        ms = (time.perf_counter() - started) * 1000
+        metrics.observe("span_latency_ms", ms, span=name)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.add_span(name, ms, attrs)
+
+
+def count(name, value=1, **labels):
+    """Increment `<name>_total` (with labels) and the current trace's counter."""
+    metrics.inc(f"{name}_total", value, **labels)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.count(name, value)
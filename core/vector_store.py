@@ -1,84 +1,367 @@
 import os
+import json
+import time
+import asyncio
+import random
+import hashlib
 import uuid
-from qdrant_client import QdrantClient
-from qdrant_client.http import models
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 import voyageai
+from voyageai import error as voyage_error
 from dotenv import load_dotenv
+from core.embedding_cache import QueryEmbeddingCache
+from core.backends import VectorPoint, create_backend
+from core.lexical import is_exact_term_query
+from core import telemetry
 
 load_dotenv()
 
+# Namespace for deterministic point IDs (UUID v5 of "<patient_id>_<internal_id>")
+NAMESPACE_MEDICAL = uuid.UUID("6ba7b810-9dad-11d1-80b4-00c04fd430c8")
+
+# Voyage per-request limits (voyage-3.5): max texts and max total tokens per call
+VOYAGE_MAX_BATCH_TEXTS = 1000
+VOYAGE_MAX_BATCH_TOKENS = 320_000
+
+# Transient provider errors that are worth retrying with backoff
+RETRYABLE_EMBED_ERRORS = (
+    voyage_error.RateLimitError,
+    voyage_error.ServiceUnavailableError,
+    voyage_error.ServerError,
+    voyage_error.APIConnectionError,
+    voyage_error.Timeout,
+)
+
+
+def point_id_for(patient_id, internal_id):
+    """Deterministic UUID v5 point ID for a patient event."""
+    return str(uuid.uuid5(NAMESPACE_MEDICAL, f"{patient_id}_{internal_id}"))
+
+
+def content_hash(chunk):
+    """Stable hash of everything that ends up in a point (text + metadata)."""
+    canonical = json.dumps(
+        {"text": chunk["text"], "metadata": chunk["metadata"]},
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def estimate_tokens(text):
+    """Cheap, conservative token estimate (~3 chars per token) for batch sizing."""
+    return len(text) // 3 + 1
+
 
 class MedicalVectorStore:
-    def __init__(self):
-        self.qdrant_url = os.getenv("QDRANT_URL", "http://localhost:6333")
-        self.client = QdrantClient(url=self.qdrant_url)
+    def __init__(self, backend=None, voyage_client=None, async_voyage_client=None):
+        # Searches and upserts go through this alias; the physical collection
+        # behind it is named after the embedding model and dimension so a
+        # rebuild can be prepared in a shadow collection and swapped in.
         self.collection_name = "medical_records"
         api_key = os.getenv("VOYAGE_API_KEY")
-        if api_key:
+        if voyage_client is not None:
+            # Injected embedder with Voyage's `embed` interface (e.g. benchmarks)
+            self.voyage_client = voyage_client
+            self.async_voyage_client = async_voyage_client
+        elif api_key:
             self.voyage_client = voyageai.Client(api_key=api_key)
+            self.async_voyage_client = voyageai.AsyncClient(api_key=api_key)
         else:
             self.voyage_client = None
-        self.embedding_model = "voyage-3.5"
-        self._ensure_collection()
-
-    def _ensure_collection(self):
-        collections = self.client.get_collections().collections
-        if not any(c.name == self.collection_name for c in collections):
-            self.client.create_collection(
-                collection_name=self.collection_name,
-                vectors_config=models.VectorParams(
-                    size=512,  # Reduced dimension for more general matching
-                    distance=models.Distance.COSINE,
-                ),
-            )
-            # Add payload indexes for filterable keys
-            self.client.create_payload_index(
-                collection_name=self.collection_name,
-                field_name="patient_id",
-                field_schema=models.PayloadSchemaType.KEYWORD,
-            )
-            self.client.create_payload_index(
-                collection_name=self.collection_name,
-                field_name="event_type",
-                field_schema=models.PayloadSchemaType.KEYWORD,
-            )
-            self.client.create_payload_index(
-                collection_name=self.collection_name,
-                field_name="timestamp",
-                field_schema=models.PayloadSchemaType.KEYWORD,
-            )
+            self.async_voyage_client = None
+        self.embedding_model = os.getenv("EMBEDDING_MODEL", "voyage-3.5")
+        self.embedding_dim = int(os.getenv("EMBEDDING_DIM", "512"))
 
-    def upsert_chunks(self, chunks):
-        points = []
-        for i, chunk in enumerate(chunks):
-            text = chunk["text"]
-            metadata = chunk["metadata"]
+        # Ingestion pipeline tuning
+        self.embed_batch_size = min(
+            int(os.getenv("EMBED_BATCH_SIZE", "128")), VOYAGE_MAX_BATCH_TEXTS
+        )
+        self.embed_concurrency = max(1, int(os.getenv("EMBED_CONCURRENCY", "4")))
+        self.embed_max_retries = int(os.getenv("EMBED_MAX_RETRIES", "5"))
+        self.upsert_batch_size = int(os.getenv("UPSERT_BATCH_SIZE", "256"))
+
+        # Query embeddings are cached (in-process LRU + optional SQLite file)
+        self.query_cache = QueryEmbeddingCache(
+            max_entries=int(os.getenv("QUERY_CACHE_SIZE", "1024")),
+            path=os.getenv("QUERY_CACHE_PATH") or None,
+            max_disk_entries=int(os.getenv("QUERY_CACHE_DB_MAX_ENTRIES", "100000")),
+        )
+
+        # Hybrid dense + BM25 retrieval with a lexical-only fast path
+        self.hybrid_search = os.getenv("HYBRID_SEARCH", "true").lower() == "true"
+
+        # Storage engine: Qdrant by default, or the in-process local backend
+        self.backend = backend or create_backend(
+            self.collection_name, self.embedding_model, self.embedding_dim
+        )
+        self.backend.ensure_collection()
 
-            # Generate embedding with 512 dimensions
-            embedding = self.voyage_client.embed(
-                [text], model=self.embedding_model, output_dimension=512
-            ).embeddings[0]
+    def needs_rebuild(self):
+        return self.backend.needs_rebuild()
 
-            # Generate deterministic UUID point ID using internal_id (visit_id, lab_id, etc.)
-            # but we don't save this redundant ID in the payload.
-            NAMESPACE_MEDICAL = uuid.UUID("6ba7b810-9dad-11d1-80b4-00c04fd430c8")
+    def get_live_collection(self):
+        return self.backend.get_live_collection()
+
+    def create_shadow_collection(self):
+        return self.backend.create_shadow_collection()
+
+    def swap_alias(self, collection, drop_previous=True):
+        self.backend.swap_alias(collection, drop_previous=drop_previous)
+
+    def get_indexed_patient_ids(self):
+        return self.backend.get_indexed_patient_ids()
+
+    def delete_points(self, patient_id, point_ids):
+        self.backend.delete_points(patient_id, point_ids)
+
+    def delete_patient(self, patient_id):
+        self.backend.delete_patient(patient_id)
+
+    def copy_patients(self, patient_ids, collection_name):
+        self.backend.copy_patients(patient_ids, collection_name)
+
+    def diff_patient_chunks(self, patient_id, chunks):
+        """
+        Compare a patient's current chunks against the index.
+
+        Returns:
+            (changed_chunks, stale_point_ids, unchanged_count) where stale IDs
+            belong to visits/labs that no longer exist in the source record.
+        """
+        indexed = self.backend.get_indexed_hashes(patient_id)
+        changed, current_ids = [], set()
+        for chunk in chunks:
+            point_id = point_id_for(patient_id, chunk["internal_id"])
+            current_ids.add(point_id)
+            if indexed.get(point_id) != content_hash(chunk):
+                changed.append(chunk)
+        stale = [point_id for point_id in indexed if point_id not in current_ids]
+        return changed, stale, len(current_ids) - len(changed)
+
+    def _embed_texts(self, texts):
+        """Embed a batch of texts, retrying transient errors with exponential backoff."""
+        for attempt in range(self.embed_max_retries + 1):
+            try:
+                with telemetry.span("embed", texts=len(texts)):
+                    return self.voyage_client.embed(
+                        texts,
+                        model=self.embedding_model,
+                        output_dimension=self.embedding_dim,
+                    ).embeddings
+            except RETRYABLE_EMBED_ERRORS:
+                telemetry.count("embed_retries")
+                if attempt == self.embed_max_retries:
+                    raise
+                # Full jitter keeps concurrent workers from retrying in lockstep
+                time.sleep(random.uniform(0, min(30.0, 0.5 * 2**attempt)))
+
+    async def _aembed_texts(self, texts):
+        """Async counterpart of `_embed_texts` using the async Voyage client."""
+        for attempt in range(self.embed_max_retries + 1):
+            try:
+                with telemetry.span("embed", texts=len(texts)):
+                    response = await self.async_voyage_client.embed(
+                        texts,
+                        model=self.embedding_model,
+                        output_dimension=self.embedding_dim,
+                    )
+                return response.embeddings
+            except RETRYABLE_EMBED_ERRORS:
+                telemetry.count("embed_retries")
+                if attempt == self.embed_max_retries:
+                    raise
+                await asyncio.sleep(random.uniform(0, min(30.0, 0.5 * 2**attempt)))
+
+    def _iter_embed_batches(self, chunks):
+        """Group chunks into batches that respect the provider's count and token limits."""
+        batch, batch_tokens = [], 0
+        for chunk in chunks:
+            tokens = estimate_tokens(chunk["text"])
+            if batch and (
+                len(batch) >= self.embed_batch_size
+                or batch_tokens + tokens > VOYAGE_MAX_BATCH_TOKENS
+            ):
+                yield batch
+                batch, batch_tokens = [], 0
+            batch.append(chunk)
+            batch_tokens += tokens
+        if batch:
+            yield batch
+
+    def _embed_batch_to_points(self, batch):
+        embeddings = self._embed_texts([chunk["text"] for chunk in batch])
+        points = []
+        for chunk, embedding in zip(batch, embeddings):
+            metadata = chunk["metadata"]
+            # Deterministic point ID from internal_id (visit_id, lab_id, etc.);
+            # the redundant ID itself is not saved in the payload.
             internal_id = chunk.get("internal_id", str(uuid.uuid4()))
-            point_id = str(
-                uuid.uuid5(
-                    NAMESPACE_MEDICAL,
-                    f"{metadata['patient_id']}_{internal_id}",
+            points.append(
+                VectorPoint(
+                    id=point_id_for(metadata["patient_id"], internal_id),
+                    vector=embedding,
+                    payload={
+                        "text": chunk["text"],
+                        **metadata,
+                        "content_hash": content_hash(chunk),
+                    },
                 )
             )
+        return points
 
-            points.append(
-                models.PointStruct(
-                    id=point_id, vector=embedding, payload={"text": text, **metadata}
-                )
+    def upsert_chunks(self, chunks, on_progress=None, collection_name=None):
+        """
+        Embed and upsert chunks through a batched, bounded-concurrency pipeline.
+
+        `chunks` may be any iterable (including a generator), so a large corpus
+        is streamed: at most `embed_concurrency` embedding batches are in flight
+        and points are flushed to the backend in `upsert_batch_size` groups.
+
+        Args:
+            chunks: Iterable of {"text", "metadata", "internal_id"} dicts
+            on_progress: Optional callback receiving the running stats dict
+            collection_name: Target collection (defaults to the live alias;
+                pass a shadow collection during a rebuild)
+
+        Returns:
+            Dict with `chunks`, `seconds` and `chunks_per_sec`.
+        """
+        with telemetry.span("upsert_chunks"):
+            return self._upsert_chunks(chunks, on_progress, collection_name)
+
+    def _upsert_chunks(self, chunks, on_progress, collection_name):
+        start = time.perf_counter()
+        stats = {"chunks": 0, "seconds": 0.0, "chunks_per_sec": 0.0}
+        pending = []
+
+        def flush(force=False):
+            while pending and (force or len(pending) >= self.upsert_batch_size):
+                batch = pending[: self.upsert_batch_size]
+                del pending[: self.upsert_batch_size]
+                with telemetry.span("vector_upsert", points=len(batch)):
+                    self.backend.upsert(batch, collection_name=collection_name)
+                telemetry.count("chunks_upserted", len(batch))
+                stats["chunks"] += len(batch)
+                stats["seconds"] = time.perf_counter() - start
+                stats["chunks_per_sec"] = stats["chunks"] / max(stats["seconds"], 1e-9)
+                if on_progress:
+                    on_progress(dict(stats))
+
+        def collect(futures):
+            for future in futures:
+                pending.extend(future.result())
+            flush()
+
+        with ThreadPoolExecutor(max_workers=self.embed_concurrency) as pool:
+            in_flight = set()
+            for batch in self._iter_embed_batches(chunks):
+                if len(in_flight) >= self.embed_concurrency:
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    collect(done)
+                in_flight.add(pool.submit(self._embed_batch_to_points, batch))
+            collect(in_flight)
+        flush(force=True)
+
+        stats["seconds"] = time.perf_counter() - start
+        stats["chunks_per_sec"] = stats["chunks"] / max(stats["seconds"], 1e-9)
+        return stats
+
+    def _cached_query_embedding(self, query):
+        embedding = self.query_cache.get(
+            query, self.embedding_model, self.embedding_dim
+        )
+        if embedding is None:
+            telemetry.count("query_embedding_cache_misses")
+        else:
+            telemetry.count("query_embedding_cache_hits")
+        return embedding
+
+    def embed_query(self, query):
+        """Embed a search query, served from the query cache when possible."""
+        embedding = self._cached_query_embedding(query)
+        if embedding is None:
+            embedding = self._embed_texts([query])[0]
+            self.query_cache.put(
+                query, self.embedding_model, self.embedding_dim, embedding
+            )
+        return embedding
+
+    async def aembed_query(self, query):
+        embedding = self._cached_query_embedding(query)
+        if embedding is None:
+            embedding = (await self._aembed_texts([query]))[0]
+            self.query_cache.put(
+                query, self.embedding_model, self.embedding_dim, embedding
             )
+        return embedding
+
+    def _embed_queries(self, queries):
+        """Embed many queries with at most one provider call (cache misses only)."""
+        embeddings = {}
+        misses = []
+        for query in queries:
+            if query in embeddings:
+                continue
+            cached = self._cached_query_embedding(query)
+            if cached is None:
+                misses.append(query)
+            embeddings[query] = cached
+        return embeddings, misses
 
-        self.client.upsert(collection_name=self.collection_name, points=points)
+    def _store_query_embeddings(self, embeddings, misses, vectors):
+        for query, vector in zip(misses, vectors):
+            embeddings[query] = vector
+            self.query_cache.put(query, self.embedding_model, self.embedding_dim, vector)
+        return embeddings
 
-    def search(self, query, patient_id, limit=5, event_type=None, order_by_date=False):
+    def _lexical_first(self, search):
+        """Whether `search` is tried lexically before it is embedded."""
+        return (
+            self.hybrid_search
+            and not search.get("order_by_date")
+            and is_exact_term_query(search["query"])
+        )
+
+    @staticmethod
+    def _chronological(search):
+        """Whether `search` only asks for the latest records (no query to rank)."""
+        return bool(search.get("order_by_date")) and not search["query"].strip()
+
+    def _batch_requests(self, searches, embeddings=None):
+        """Backend requests for `searches`; without embeddings, lexical only."""
+        requests = []
+        for search in searches:
+            chronological = self._chronological(search)
+            vector = None
+            if embeddings is not None and not chronological:
+                vector = embeddings[search["query"]]
+            requests.append(
+                {
+                    "vector": vector,
+                    "text": search["query"]
+                    if self.hybrid_search and not chronological
+                    else None,
+                    "order_by_date": bool(search.get("order_by_date")),
+                    "patient_id": search["patient_id"],
+                    "limit": search.get("limit", 5),
+                    "event_type": search.get("event_type"),
+                    "date_from": search.get("date_from"),
+                    "date_to": search.get("date_to"),
+                }
+            )
+        return requests
+
+    def search(
+        self,
+        query,
+        patient_id,
+        limit=5,
+        event_type=None,
+        order_by_date=False,
+        date_from=None,
+        date_to=None,
+    ):
         """
         Search for medical records.
 
@@ -87,36 +370,144 @@ class MedicalVectorStore:
             patient_id: Patient ID to filter
             limit: Number of results
             event_type: Filter by 'visit' or 'lab' (optional)
-            order_by_date: If True, sort by timestamp descending (for "most recent" queries)
+            order_by_date: If True, return the records most relevant to `query`
+                newest first; with an empty `query`, simply the most recent
+                records (indexed server-side ordering; no embedding call)
+            date_from: Inclusive lower bound on timestamp, ISO date (optional)
+            date_to: Inclusive upper bound on timestamp, ISO date (optional)
+
+        With hybrid search on, dense and BM25 rankings are fused (RRF), and a
+        single exact term ("hba1c", "losartán") is first tried lexically only,
+        skipping the embedding call whenever that finds matches.
         """
-        query_embedding = self.voyage_client.embed(
-            [query], model=self.embedding_model, output_dimension=512
-        ).embeddings[0]
+        with telemetry.span("search", event_type=event_type):
+            filters = dict(event_type=event_type, date_from=date_from, date_to=date_to)
+            if order_by_date and not query.strip():
+                with telemetry.span("vector_query"):
+                    return self.backend.latest(patient_id, limit=limit, **filters)
 
-        must_filters = [
-            models.FieldCondition(
-                key="patient_id", match=models.MatchValue(value=patient_id)
-            )
-        ]
+            if self.hybrid_search and not order_by_date and is_exact_term_query(query):
+                with telemetry.span("vector_query"):
+                    results = self.backend.lexical_query(
+                        query, patient_id, limit=limit, **filters
+                    )
+                if results:
+                    return results
 
-        if event_type:
-            must_filters.append(
-                models.FieldCondition(
-                    key="event_type", match=models.MatchValue(value=event_type)
+            embedding = self.embed_query(query)
+            with telemetry.span("vector_query"):
+                return self.backend.query(
+                    embedding,
+                    patient_id,
+                    limit=limit,
+                    text=query if self.hybrid_search else None,
+                    order_by_date=order_by_date,
+                    **filters,
                 )
-            )
 
-        results = self.client.query_points(
-            collection_name=self.collection_name,
-            query=query_embedding,
-            query_filter=models.Filter(must=must_filters),
-            limit=limit if not order_by_date else 20,  # Get more results for sorting
-        ).points
+    def search_many(self, searches):
+        """
+        Run several searches with one embedding call and one backend round trip.
+
+        Exact-term searches go through the lexical fast path of `search` first,
+        in one extra round trip, and only the ones it misses are embedded.
 
-        # If we need chronological order, sort by timestamp
-        if order_by_date:
-            results = sorted(
-                results, key=lambda x: x.payload.get("timestamp", ""), reverse=True
-            )[:limit]
+        Args:
+            searches: List of dicts with the keyword arguments of `search`
+                (`query`, `patient_id`, and optionally `limit`, `event_type`,
+                `order_by_date`, `date_from`, `date_to`)
+
+        Returns:
+            One result list per search, in the same order.
+        """
+        with telemetry.span("search", searches=len(searches)):
+            results = [None] * len(searches)
+            lexical = [i for i, s in enumerate(searches) if self._lexical_first(s)]
+            if lexical:
+                requests = self._batch_requests([searches[i] for i in lexical])
+                with telemetry.span("vector_query"):
+                    found = self.backend.query_batch(requests)
+                for i, hits in zip(lexical, found):
+                    results[i] = hits or None
+
+            rest = [i for i, hits in enumerate(results) if hits is None]
+            if rest:
+                remaining = [searches[i] for i in rest]
+                queries = [s["query"] for s in remaining if not self._chronological(s)]
+                embeddings, misses = self._embed_queries(queries)
+                if misses:
+                    self._store_query_embeddings(
+                        embeddings, misses, self._embed_texts(misses)
+                    )
+                requests = self._batch_requests(remaining, embeddings)
+                with telemetry.span("vector_query"):
+                    found = self.backend.query_batch(requests)
+                for i, hits in zip(rest, found):
+                    results[i] = hits
+            return results
+
+    async def asearch_many(self, searches):
+        """Async variant of `search_many`."""
+        with telemetry.span("search", searches=len(searches)):
+            results = [None] * len(searches)
+            lexical = [i for i, s in enumerate(searches) if self._lexical_first(s)]
+            if lexical:
+                requests = self._batch_requests([searches[i] for i in lexical])
+                with telemetry.span("vector_query"):
+                    found = await self.backend.aquery_batch(requests)
+                for i, hits in zip(lexical, found):
+                    results[i] = hits or None
 
-        return results
+            rest = [i for i, hits in enumerate(results) if hits is None]
+            if rest:
+                remaining = [searches[i] for i in rest]
+                queries = [s["query"] for s in remaining if not self._chronological(s)]
+                embeddings, misses = self._embed_queries(queries)
+                if misses:
+                    self._store_query_embeddings(
+                        embeddings, misses, await self._aembed_texts(misses)
+                    )
+                requests = self._batch_requests(remaining, embeddings)
+                with telemetry.span("vector_query"):
+                    found = await self.backend.aquery_batch(requests)
+                for i, hits in zip(rest, found):
+                    results[i] = hits
+            return results
+
+    async def asearch(
+        self,
+        query,
+        patient_id,
+        limit=5,
+        event_type=None,
+        order_by_date=False,
+        date_from=None,
+        date_to=None,
+    ):
+        """Async variant of `search` (async Voyage + async backend calls)."""
+        with telemetry.span("search", event_type=event_type):
+            filters = dict(event_type=event_type, date_from=date_from, date_to=date_to)
+            if order_by_date and not query.strip():
+                with telemetry.span("vector_query"):
+                    return await self.backend.alatest(
+                        patient_id, limit=limit, **filters
+                    )
+
+            if self.hybrid_search and not order_by_date and is_exact_term_query(query):
+                with telemetry.span("vector_query"):
+                    results = await self.backend.alexical_query(
+                        query, patient_id, limit=limit, **filters
+                    )
+                if results:
+                    return results
+
+            embedding = await self.aembed_query(query)
+            with telemetry.span("vector_query"):
+                return await self.backend.aquery(
+                    embedding,
+                    patient_id,
+                    limit=limit,
+                    text=query if self.hybrid_search else None,
+                    order_by_date=order_by_date,
+                    **filters,
+                )
@@ -0,0 +1,94 @@
+import os
+import sys
+import json
+import time
+import argparse
+
+# Add project root to sys.path to resolve core and utils modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.synthetic import iter_synthetic_patients
+
+
+def generate_corpus(
+    output, patients, visits, labs, note_words, seed=0, fmt="ndjson", start=0
+):
+    """
+    Write synthetic patients either as one NDJSON file (one patient per line,
+    for `ingest_data.py --ndjson`) or as one JSON file per patient in a
+    directory (like `data/`). Patients are generated and written one at a
+    time, so memory stays flat for any corpus size.
+    """
+    started = time.perf_counter()
+    events = 0
+    report_every = max(1, patients // 20)
+
+    if fmt == "ndjson":
+        directory = os.path.dirname(output)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        out = open(output, "w", encoding="utf-8")
+    else:
+        os.makedirs(output, exist_ok=True)
+        out = None
+
+    try:
+        for written, patient in enumerate(
+            iter_synthetic_patients(patients, visits, labs, note_words, seed, start), 1
+        ):
+            if out is not None:
+                out.write(json.dumps(patient, ensure_ascii=False) + "\n")
+            else:
+                path = os.path.join(output, f"{patient['patient_id']}.json")
+                with open(path, "w", encoding="utf-8") as f:
+                    json.dump(patient, f, ensure_ascii=False, indent=2)
+            events += len(patient["recent_visits"]) + len(patient["lab_results"])
+            if written % report_every == 0:
+                print(f"   ↳ {written}/{patients} patients, {events} events")
+    finally:
+        if out is not None:
+            out.close()
+
+    seconds = time.perf_counter() - started
+    print(
+        f"✨ Wrote {patients} patients ({events} events) to {output} "
+        f"in {seconds:.1f}s."
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Generate a synthetic patient corpus in the data/ JSON schema."
+    )
+    parser.add_argument("--patients", type=int, default=1000)
+    parser.add_argument("--visits", type=int, default=20, help="Visits per patient.")
+    parser.add_argument("--labs", type=int, default=20, help="Lab results per patient.")
+    parser.add_argument(
+        "--note-words", type=int, default=20, help="Approximate words per visit note."
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--start", type=int, default=0, help="First patient index (for appending)."
+    )
+    parser.add_argument(
+        "--format",
+        choices=["ndjson", "json"],
+        default="ndjson",
+        help="One NDJSON file, or one JSON file per patient in a directory.",
+    )
+    parser.add_argument(
+        "--output",
+        default="corpus/patients.ndjson",
+        help="NDJSON file path, or directory for --format json.",
+    )
+    args = parser.parse_args()
+    generate_corpus(
+        args.output,
+        args.patients,
+        args.visits,
+        args.labs,
+        args.note_words,
+        seed=args.seed,
+        fmt=args.format,
+        start=args.start,
+    )
@@ -1,61 +1,415 @@
 import os
 import json
 import sys
+import argparse
+from itertools import islice
 
 # Add project root to sys.path to resolve core and utils modules
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from core.vector_store import MedicalVectorStore
-from utils.narrative import patient_to_chunks
+from core.lab_store import LabStore
+from core.patient_sources import DATA_DIR_SOURCE, PatientSources
+from core.result_cache import DataVersions
+from utils.narrative import patient_to_chunks, patient_to_lab_observations
 from dotenv import load_dotenv
 
 load_dotenv()
 
 
-def first_run_ingestion():
-    print("🚀 Starting First Run Ingestion...")
-    vs = MedicalVectorStore()
-    data_dir = "data"
+def iter_patients(data_dir, files, failures, lab_store):
+    """
+    Yield (filename, patient_data, chunks) per file, recording files that fail.
+    Each patient's numeric lab series is refreshed in the lab store on the way.
+    """
+    for filename in files:
+        file_path = os.path.join(data_dir, filename)
+        print(f"📄 Processing {filename}...")
+
+        try:
+            with open(file_path, "r") as f:
+                patient_data = json.load(f)
+            chunks = patient_to_chunks(patient_data)
+            lab_store.write_patient(
+                patient_data["patient_id"], patient_to_lab_observations(patient_data)
+            )
+        except Exception as e:
+            print(f"❌ Error processing {filename}: {e}")
+            failures.append(filename)
+            continue
+
+        yield filename, patient_data, chunks
 
-    # Check if we need to recreate the collection due to dimension change
-    print(f"Checking collection '{vs.collection_name}'...")
+
+def iter_ndjson_patients(path, offset, failures, lab_store):
+    """
+    Yield (next_offset, patient_data, chunks) for each line of an NDJSON export,
+    starting at byte `offset`. Only one line is held in memory at a time;
+    malformed lines are recorded in `failures` and skipped.
+    """
+    with open(path, "rb") as f:
+        f.seek(offset)
+        while True:
+            line = f.readline()
+            if not line:
+                break
+            line_offset, offset = offset, f.tell()
+            if not line.strip():
+                continue
+            try:
+                patient_data = json.loads(line)
+                chunks = patient_to_chunks(patient_data)
+                lab_store.write_patient(
+                    patient_data["patient_id"], patient_to_lab_observations(patient_data)
+                )
+            except Exception as e:
+                print(f"❌ Error processing line at byte {line_offset}: {e}")
+                failures.append(line_offset)
+                continue
+            yield offset, patient_data, chunks
+
+
+def load_checkpoint(path):
     try:
-        vs.client.get_collection(vs.collection_name)
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_checkpoint(path, state):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+
+
+def report_progress(stats):
+    print(
+        f"   ↳ {stats['chunks']} chunks upserted "
+        f"({stats['chunks_per_sec']:.1f} chunks/sec)"
+    )
+
+
+def prune_data_dir_patients(vs, lab_store, sources, seen_patients, failures):
+    """
+    Drop patients (index and lab series) whose data/ file is gone. Patients
+    from other sources are never touched; skipped if some file failed to
+    parse, since its patient would otherwise look deleted.
+    """
+    if failures:
+        print("⚠️ Skipping removal of missing patients because some files failed.")
+        return set()
+    removed = sources.patient_ids(DATA_DIR_SOURCE) - seen_patients
+    for patient_id in removed:
+        print(f"🗑️ Removing patient {patient_id} (source file no longer present)")
+        vs.delete_patient(patient_id)
+        lab_store.delete_patient(patient_id)
+    sources.forget(removed)
+
+    untracked = vs.get_indexed_patient_ids() - sources.patient_ids()
+    if untracked:
         print(
-            f"Collection exists. Recreating it to ensure 512-dimension configuration..."
+            f"⚠️ Keeping {len(untracked)} indexed patients with no recorded source "
+            "(ingested before sources were tracked); re-run their ingestion to "
+            "record it."
         )
-        vs.client.delete_collection(vs.collection_name)
-    except Exception:
-        print("Collection does not exist. Creating new one...")
+    return removed
 
-    vs._ensure_collection()
 
-    files = [
-        f for f in os.listdir(data_dir) if f.endswith(".json") and f != "example.json"
-    ]
+def carry_over_other_sources(vs, sources, source, shadow, reuse_vectors):
+    """
+    Keep the patients of every other source in a rebuilt index: their points
+    are copied into the shadow collection, or, if they were embedded with
+    another model, left for their own ingestion to re-embed.
+    """
+    for other, patient_ids in sorted(sources.other_sources(source).items()):
+        command = "python scripts/ingest_data.py"
+        if other != DATA_DIR_SOURCE:
+            command += f" --ndjson {other}"
+        if reuse_vectors:
+            vs.copy_patients(patient_ids, shadow)
+            print(f"📎 Carried over {len(patient_ids)} patients from {other}.")
+        else:
+            print(
+                f"⚠️ {len(patient_ids)} patients from {other} were embedded with "
+                f"another model; run `{command}` to index them again."
+            )
 
-    if not files:
-        print("❌ No patient files found in data/ directory.")
-        return
 
-    for filename in files:
-        file_path = os.path.join(data_dir, filename)
-        print(f"📄 Processing {filename}...")
+def full_rebuild(vs, lab_store, sources, data_dir, files, versions):
+    """Re-embed everything into a shadow collection, then swap the alias to it."""
+    reuse_vectors = not vs.needs_rebuild()
+    shadow = vs.create_shadow_collection()
+    print(f"Building shadow collection '{shadow}'...")
+    failures = []
+    seen_patients = set()
 
-        try:
-            with open(file_path, "r") as f:
-                patient_data = json.load(f)
+    def all_chunks():
+        for _, patient_data, chunks in iter_patients(
+            data_dir, files, failures, lab_store
+        ):
+            seen_patients.add(patient_data["patient_id"])
+            yield from chunks
+            print(
+                f"✅ Queued {len(chunks)} chunks for {patient_data['demographics']['name']}"
+            )
 
-            chunks = patient_to_chunks(patient_data)
-            vs.upsert_chunks(chunks)
+    stats = vs.upsert_chunks(
+        all_chunks(), on_progress=report_progress, collection_name=shadow
+    )
+    sources.record(seen_patients, DATA_DIR_SOURCE)
+    carry_over_other_sources(vs, sources, DATA_DIR_SOURCE, shadow, reuse_vectors)
+    vs.swap_alias(shadow)
+    print(f"🔀 Alias '{vs.collection_name}' now points to '{shadow}'.")
+    versions.bump_all()
+    # Only the lab series are left to prune; the new index has no stale patients
+    if not failures:
+        removed = sources.patient_ids(DATA_DIR_SOURCE) - seen_patients
+        for patient_id in removed:
+            lab_store.delete_patient(patient_id)
+        sources.forget(removed)
+    return stats
+
+
+def incremental_sync(vs, lab_store, sources, data_dir, files, versions):
+    """Only re-embed chunks whose content hash changed and delete removed events."""
+    failures = []
+    seen_patients = set()
+    changed_patients = set()
+    totals = {"unchanged": 0, "deleted": 0}
+
+    def changed_chunks():
+        for filename, patient_data, chunks in iter_patients(
+            data_dir, files, failures, lab_store
+        ):
+            patient_id = patient_data["patient_id"]
+            seen_patients.add(patient_id)
+            changed, stale, unchanged = vs.diff_patient_chunks(patient_id, chunks)
+            vs.delete_points(patient_id, stale)
+            totals["unchanged"] += unchanged
+            totals["deleted"] += len(stale)
+            if changed or stale:
+                changed_patients.add(patient_id)
+            yield from changed
             print(
-                f"✅ Ingested {len(chunks)} chunks for {patient_data['demographics']['name']}"
+                f"✅ {patient_data['demographics']['name']}: {len(changed)} changed, "
+                f"{unchanged} unchanged, {len(stale)} removed"
             )
-        except Exception as e:
-            print(f"❌ Error processing {filename}: {e}")
 
-    print("\n✨ First run ingestion complete! Your Vector DB is ready.")
+    stats = vs.upsert_chunks(changed_chunks(), on_progress=report_progress)
+    sources.record(seen_patients, DATA_DIR_SOURCE)
+    changed_patients |= prune_data_dir_patients(
+        vs, lab_store, sources, seen_patients, failures
+    )
+
+    # Invalidate cached search results of every patient whose chunks moved
+    versions.bump(changed_patients)
+
+    print(
+        f"Skipped {totals['unchanged']} unchanged chunks, "
+        f"deleted {totals['deleted']} stale chunks."
+    )
+    return stats
+
+
+def ndjson_ingest(
+    vs, lab_store, sources, path, versions, full=False, resume=False, segment_size=500
+):
+    """
+    Stream an NDJSON export (one patient per line) into the index.
+
+    Patients are processed in segments of `segment_size`; after each segment is
+    fully upserted, the byte offset of the next line is saved to
+    `<path>.checkpoint.json`, so `resume=True` continues after the last
+    completed segment instead of starting over. Memory use is bounded by one
+    segment regardless of file size. With `full=True` the export is loaded
+    into a shadow collection that replaces the live one when the file is done;
+    otherwise each patient is diffed against the live index like
+    `incremental_sync` (patients absent from the export are left untouched).
+    Patients of other sources (data/, other exports) are kept either way.
+    """
+    source = os.path.abspath(path)
+    reuse_vectors = not vs.needs_rebuild()
+    checkpoint_path = f"{path}.checkpoint.json"
+    state = load_checkpoint(checkpoint_path) if resume else None
+    if state and state.get("source_size") != os.path.getsize(path):
+        print("⚠️ Export changed since the checkpoint was written; starting over.")
+        state = None
+
+    if state:
+        print(
+            f"⏩ Resuming at byte {state['offset']} "
+            f"({state['patients']} patients already ingested)."
+        )
+    else:
+        shadow = vs.create_shadow_collection() if full else None
+        if shadow:
+            print(f"Building shadow collection '{shadow}'...")
+        state = {
+            "source_size": os.path.getsize(path),
+            "offset": 0,
+            "collection": shadow,
+            "patients": 0,
+            "chunks": 0,
+            "seconds": 0.0,
+        }
+    shadow = state["collection"]
+
+    failures = []
+    patients = iter_ndjson_patients(path, state["offset"], failures, lab_store)
+    while True:
+        segment = list(islice(patients, segment_size))
+        if not segment:
+            break
+        changed_patients = set()
+
+        def segment_chunks():
+            for _, patient_data, chunks in segment:
+                if shadow:
+                    yield from chunks
+                    continue
+                patient_id = patient_data["patient_id"]
+                changed, stale, _ = vs.diff_patient_chunks(patient_id, chunks)
+                vs.delete_points(patient_id, stale)
+                if changed or stale:
+                    changed_patients.add(patient_id)
+                yield from changed
+
+        stats = vs.upsert_chunks(segment_chunks(), collection_name=shadow)
+        sources.record((patient["patient_id"] for _, patient, _ in segment), source)
+        versions.bump(changed_patients)
+
+        state["offset"] = segment[-1][0]
+        state["patients"] += len(segment)
+        state["chunks"] += stats["chunks"]
+        state["seconds"] += stats["seconds"]
+        save_checkpoint(checkpoint_path, state)
+        print(
+            f"✅ {state['patients']} patients, {state['chunks']} chunks upserted "
+            f"({stats['chunks_per_sec']:.1f} chunks/sec in this segment)"
+        )
+
+    if shadow:
+        carry_over_other_sources(vs, sources, source, shadow, reuse_vectors)
+        vs.swap_alias(shadow)
+        print(f"🔀 Alias '{vs.collection_name}' now points to '{shadow}'.")
+        versions.bump_all()
+    if failures:
+        print(f"⚠️ Skipped {len(failures)} malformed lines.")
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+
+    return {
+        "chunks": state["chunks"],
+        "seconds": state["seconds"],
+        "chunks_per_sec": state["chunks"] / max(state["seconds"], 1e-9),
+    }
+
+
+def run_ingestion(
+    full=False, ndjson=None, resume=False, segment_size=500, profile=None
+):
+    print("🚀 Starting Ingestion...")
+    if profile:
+        # The backend reads its storage profile when it is created
+        os.environ["QDRANT_PROFILE"] = profile
+    vs = MedicalVectorStore()
+    lab_store = LabStore()
+    versions = DataVersions()
+    sources = PatientSources()
+    data_dir = "data"
+
+    if ndjson:
+        print(f"Checking collection '{vs.collection_name}'...")
+        stats = ndjson_ingest(
+            vs,
+            lab_store,
+            sources,
+            ndjson,
+            versions,
+            full=full or vs.needs_rebuild(),
+            resume=resume,
+            segment_size=segment_size,
+        )
+    else:
+        files = [
+            f
+            for f in os.listdir(data_dir)
+            if f.endswith(".json") and f != "example.json" and not f.startswith(".")
+        ]
+
+        if not files:
+            print("❌ No patient files found in data/ directory.")
+            return
+
+        print(f"Checking collection '{vs.collection_name}'...")
+        if full or vs.needs_rebuild():
+            print(
+                f"Full rebuild for {vs.embedding_model} ({vs.embedding_dim} dimensions)..."
+            )
+            stats = full_rebuild(vs, lab_store, sources, data_dir, files, versions)
+        else:
+            print("Index is up to date with the embedding model. Syncing changes...")
+            stats = incremental_sync(vs, lab_store, sources, data_dir, files, versions)
+
+    # Shadow collections are created with the current indexes and profile; an
+    # existing collection is migrated in place (Qdrant re-indexes in the
+    # background). Only ingestion does this, so app workers never race on it.
+    if vs.backend.migrate_payload_indexes():
+        print(f"🗂️ Migrated the payload indexes of '{vs.collection_name}'.")
+    if vs.backend.apply_storage_profile():
+        print(
+            f"🗜️ Migrated '{vs.collection_name}' to the "
+            f"'{vs.backend.profile.name}' storage profile."
+        )
+    if profile:
+        print(
+            f"⚠️ Set QDRANT_PROFILE={profile} in .env so the app searches "
+            "with matching rescoring parameters."
+        )
+
+    print(
+        f"\n✨ Ingestion complete! Upserted {stats['chunks']} chunks "
+        f"in {stats['seconds']:.1f}s ({stats['chunks_per_sec']:.1f} chunks/sec). "
+        "Your Vector DB is ready."
+    )
 
 
 if __name__ == "__main__":
-    first_run_ingestion()
+    parser = argparse.ArgumentParser(description="Ingest patient records into Qdrant.")
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="Force a full re-embedding into a shadow collection (no downtime).",
+    )
+    parser.add_argument(
+        "--ndjson",
+        default=None,
+        help="Stream patients from an NDJSON export (one per line) instead of data/.",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="With --ndjson, continue from the last completed segment.",
+    )
+    parser.add_argument(
+        "--segment-size",
+        type=int,
+        default=500,
+        help="With --ndjson, patients per checkpointed segment.",
+    )
+    parser.add_argument(
+        "--profile",
+        default=None,
+        choices=["float32", "int8", "binary"],
+        help="Vector storage profile to migrate to (default: QDRANT_PROFILE).",
+    )
+    args = parser.parse_args()
+    run_ingestion(
+        full=args.full,
+        ndjson=args.ndjson,
+        resume=args.resume,
+        segment_size=args.segment_size,
+        profile=args.profile,
+    )
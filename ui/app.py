@@ -8,7 +8,11 @@ import uuid
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from core.vector_store import MedicalVectorStore
-from core.agent import ClinicalAssistant
+from core.agent import ClinicalAssistant, stream_turn
+from core.patient_registry import PatientRegistry
+from core.context import TurnTokens, compact_identity
+from core.router import QueryRouter
+from core import telemetry
 from langchain_core.messages import HumanMessage, AIMessage
 
 st.set_page_config(page_title="Clinical Assistant RAG", layout="wide")
@@ -19,38 +23,50 @@ st.set_page_config(page_title="Clinical Assistant RAG", layout="wide")
 def get_resources():
     vs = MedicalVectorStore()
     assistant = ClinicalAssistant(vs)
-    return vs, assistant
+    router = QueryRouter(vs)
+    return vs, assistant, router
 
 
-vector_store, assistant = get_resources()
+vector_store, assistant, router = get_resources()
 
 # Sidebar: Patient Selection
 st.sidebar.title("Patient Selector")
 
 
-def get_patient_list():
-    patients = []
-    data_dir = "data"
-    for filename in os.listdir(data_dir):
-        if filename.endswith(".json") and filename != "example.json":
-            with open(os.path.join(data_dir, filename), "r") as f:
-                try:
-                    data = json.load(f)
-                    name = data.get("demographics", {}).get("name", "Unknown")
-                    p_id = data.get("patient_id", "No ID")
-                    patients.append(
-                        {
-                            "display": f"{name} - {p_id}",
-                            "filename": filename,
-                            "id": p_id,
-                        }
-                    )
-                except:
-                    continue
-    return sorted(patients, key=lambda x: x["display"])
-
-
-patient_options = get_patient_list()
+@st.cache_resource
+def get_patient_registry():
+    return PatientRegistry("data")
+
+
+PATIENTS_PER_PAGE = 50
+# Messages kept on screen; the agent's own memory is bounded separately
+# (recent turns verbatim plus a running summary)
+CHAT_HISTORY_LIMIT = int(os.getenv("CHAT_HISTORY_LIMIT", "40"))
+
+
+def append_history(message):
+    history = st.session_state.chat_history
+    history.append(message)
+    del history[:-CHAT_HISTORY_LIMIT]
+
+
+registry = get_patient_registry()
+registry.refresh()
+
+search_text = st.sidebar.text_input("Search patients", placeholder="Name or ID")
+patient_options, total_matches = registry.search(search_text, limit=PATIENTS_PER_PAGE)
+if total_matches > PATIENTS_PER_PAGE:
+    page_count = (total_matches + PATIENTS_PER_PAGE - 1) // PATIENTS_PER_PAGE
+    page = st.sidebar.number_input(
+        f"Page (of {page_count})", min_value=1, max_value=page_count, value=1
+    )
+    if page > 1:
+        patient_options, _ = registry.search(
+            search_text,
+            offset=(page - 1) * PATIENTS_PER_PAGE,
+            limit=PATIENTS_PER_PAGE,
+        )
+st.sidebar.caption(f"{total_matches} of {len(registry)} patients")
 selected_patient = st.sidebar.selectbox(
     "Select Patient", patient_options, format_func=lambda x: x["display"]
 )
@@ -58,11 +74,54 @@ selected_patient = st.sidebar.selectbox(
 st.sidebar.divider()
 st.sidebar.subheader("System Status")
 st.sidebar.caption("Vector DB: Qdrant Connected")
+cache_stats = vector_store.query_cache.stats()
+st.sidebar.caption(
+    f"Query embedding cache: {cache_stats['hits']} hits / "
+    f"{cache_stats['misses']} misses ({cache_stats['hit_rate']:.0%})"
+)
+tool_cache_stats = assistant.result_cache.stats()
+st.sidebar.caption(
+    f"Search result cache: {tool_cache_stats['hits']} hits / "
+    f"{tool_cache_stats['misses']} misses ({tool_cache_stats['hit_rate']:.0%})"
+)
+
+
+def render_latency_breakdown(container, trace):
+    """Per-turn latency breakdown of the last chat turn in the sidebar."""
+    spans = trace["spans"]
+    counters = trace["counters"]
+
+    def ms(name):
+        return spans.get(name, {}).get("ms", 0.0)
+
+    def calls(name):
+        return int(counters.get(name, 0))
+
+    def hits(cache):
+        hit = calls(f"{cache}_cache_hits")
+        return f"{hit}/{hit + calls(f'{cache}_cache_misses')}"
+
+    with container.container():
+        st.markdown(f"**⏱️ Last turn: {trace['total_ms']:.0f} ms**")
+        st.caption(
+            f"LLM: {ms('llm'):.0f} ms over {calls('model_calls')} step(s)  \n"
+            f"Tools: {ms('tool'):.0f} ms over {calls('tool_calls')} call(s)  \n"
+            f"↳ Embedding: {ms('embed'):.0f} ms · "
+            f"Vector DB: {ms('vector_query'):.0f} ms  \n"
+            f"Tokens: {calls('input_tokens')} in / {calls('output_tokens')} out  \n"
+            f"Cache hits: embeddings {hits('query_embedding')}, "
+            f"results {hits('tool_result')}"
+        )
+
+
+latency_panel = st.sidebar.empty()
+if "last_trace" in st.session_state:
+    render_latency_breakdown(latency_panel, st.session_state.last_trace)
+with st.sidebar.expander("Metrics (Prometheus)"):
+    st.code(telemetry.metrics.render_prometheus(), language="text")
 
 if selected_patient:
-    filename = selected_patient["filename"]
-    with open(os.path.join("data", filename), "r") as f:
-        patient_data = json.load(f)
+    patient_data = registry.load(selected_patient["id"])
 
     patient_id = patient_data["patient_id"]
 
@@ -107,95 +166,110 @@ if selected_patient:
                 st.markdown(message.content)
 
     if prompt := st.chat_input("Ask about patient history, lab trends, etc."):
-        st.session_state.chat_history.append(HumanMessage(content=prompt))
+        append_history(HumanMessage(content=prompt))
         with st.chat_message("user"):
             st.markdown(prompt)
 
         # Prepare Identity Context for System Prompt
-        identity_context = json.dumps(
-            {"demographics": dem, "medical_history": med}, indent=2
-        )
+        identity_context = compact_identity(dem, med)
 
         executor = assistant.get_executor(identity_context, patient_id)
+        config = {"configurable": {"thread_id": st.session_state.thread_id}}
 
         with st.chat_message("assistant"):
-            # Create placeholder for streaming
-            message_placeholder = st.empty()
-            tool_calls_placeholder = st.container()
-
-            full_response = ""
-            tool_calls_found = []
-
-            # Stream the response
-            with st.spinner("Analyzing records..."):
-                for chunk in executor.stream(
-                    {"messages": [("user", prompt)]},
-                    config={"configurable": {"thread_id": st.session_state.thread_id}},
-                    stream_mode="values",
-                ):
-                    messages = chunk.get("messages", [])
-
-                    if messages:
-                        last_msg = messages[-1]
-
-                        # Check for tool calls
-                        if hasattr(last_msg, "tool_calls") and last_msg.tool_calls:
-                            for tc in last_msg.tool_calls:
-                                # Find corresponding response
-                                tool_response = None
-                                msg_index = messages.index(last_msg)
-                                if msg_index + 1 < len(messages):
-                                    next_msg = messages[msg_index + 1]
-                                    if hasattr(next_msg, "content"):
-                                        tool_response = next_msg.content
-
-                                tool_call_data = {
-                                    "name": tc.get("name"),
-                                    "args": tc.get("args"),
-                                    "response": tool_response,
-                                }
-
-                                if tool_call_data not in tool_calls_found:
-                                    tool_calls_found.append(tool_call_data)
-
-                        # Stream final AI response
-                        if (
-                            hasattr(last_msg, "content")
-                            and type(last_msg).__name__ == "AIMessage"
-                        ):
-                            if (
-                                not last_msg.tool_calls
-                            ):  # Only show final answer, not tool call messages
-                                full_response = last_msg.content
-                                message_placeholder.markdown(full_response + "▌")
-
-            # Show final response without cursor
-            message_placeholder.markdown(full_response)
-
-            # Show tool calls
-            with tool_calls_placeholder:
-                for tc in tool_calls_found:
-                    with st.expander(f"🛠️ Tool Call: {tc['name']}", expanded=False):
-                        st.write("**Input:**")
-                        st.json(tc["args"])
-                        if tc["response"]:
-                            st.write("**Observation:**")
-                            st.text(tc["response"])
-
-            # Store AI message with tool calls
-            tool_calls_formatted = [
-                {
-                    "name": tc["name"],
-                    "args": tc["args"],
-                    "id": str(uuid.uuid4()),
-                    "type": "tool_call",
-                }
-                for tc in tool_calls_found
-            ]
-            ai_msg = AIMessage(
-                content=full_response,
-                tool_calls=tool_calls_formatted,
-            )
-            st.session_state.chat_history.append(ai_msg)
+            # Plain lookups (latest visit/lab, allergies, medications,
+            # conditions) are answered directly, without the LLM loop
+            with telemetry.start_trace("chat_turn") as trace:
+                routed = router.route(prompt, patient_id, med)
+                if routed is not None:
+                    assistant.record_turn(executor, config, prompt, routed["answer"])
+            if routed is not None:
+                st.session_state.last_trace = trace.as_dict()
+                render_latency_breakdown(latency_panel, st.session_state.last_trace)
+                st.markdown(routed["answer"])
+                st.caption(f"⚡ Answered directly ({routed['intent']}), no LLM call")
+                append_history(AIMessage(content=routed["answer"]))
+            else:
+                # Create placeholder for streaming
+                message_placeholder = st.empty()
+                tool_calls_placeholder = st.container()
+
+                full_response = ""
+                # Tool calls keyed by call id so observations attach in O(1)
+                tool_calls_found = {}
+                turn_tokens = TurnTokens()
+
+                # Stream tokens and tool-call progress as they happen; every span
+                # and counter recorded meanwhile lands in this turn's trace
+                with telemetry.start_trace("chat_turn") as trace, st.status(
+                    "Analyzing records...", expanded=False
+                ) as status:
+                    for event in stream_turn(
+                        executor,
+                        prompt,
+                        config,
+                    ):
+                        if event["type"] == "token":
+                            full_response += event["text"]
+                            message_placeholder.markdown(full_response + "▌")
+                        elif event["type"] == "tool_call":
+                            tool_calls_found[event["id"]] = {
+                                "name": event["name"],
+                                "args": event["args"],
+                                "response": None,
+                            }
+                            status.update(label=f"🛠️ Calling {event['name']}...")
+                            args = json.dumps(event["args"], ensure_ascii=False)
+                            status.write(f"🛠️ {event['name']}: `{args}`")
+                        elif event["type"] == "tool_result":
+                            call = tool_calls_found.get(event["id"])
+                            if call is not None:
+                                call["response"] = event["content"]
+                            turn_tokens.add_tool_output(event["content"])
+                            status.write(f"✅ {event['name']} returned")
+                        elif event["type"] == "ai_message":
+                            turn_tokens.add_message(event["message"])
+                            if event["message"].tool_calls:
+                                # Tokens belonged to a tool-calling step, not the answer
+                                full_response = ""
+                                message_placeholder.empty()
+                            else:
+                                full_response = event["message"].content
+                    status.update(label="Done", state="complete")
+
+                    telemetry.count("input_tokens", turn_tokens.input_tokens)
+                    telemetry.count("output_tokens", turn_tokens.output_tokens)
+                st.session_state.last_trace = trace.as_dict()
+                render_latency_breakdown(latency_panel, st.session_state.last_trace)
+
+                # Show final response without cursor
+                message_placeholder.markdown(full_response)
+                st.caption(f"🧮 Tokens this turn: {turn_tokens}")
+
+                # Show tool calls
+                with tool_calls_placeholder:
+                    for tc in tool_calls_found.values():
+                        with st.expander(f"🛠️ Tool Call: {tc['name']}", expanded=False):
+                            st.write("**Input:**")
+                            st.json(tc["args"])
+                            if tc["response"]:
+                                st.write("**Observation:**")
+                                st.text(tc["response"])
+
+                # Store AI message with tool calls
+                tool_calls_formatted = [
+                    {
+                        "name": tc["name"],
+                        "args": tc["args"],
+                        "id": str(uuid.uuid4()),
+                        "type": "tool_call",
+                    }
+                    for tc in tool_calls_found.values()
+                ]
+                ai_msg = AIMessage(
+                    content=full_response,
+                    tool_calls=tool_calls_formatted,
+                )
+                append_history(ai_msg)
 else:
     st.info("Please select a patient from the sidebar to begin.")
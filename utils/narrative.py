@@ -1,4 +1,6 @@
+import re
 import json
+import unicodedata
 
 
 def visit_to_narrative(visit, patient_name):
@@ -71,3 +73,59 @@ def patient_to_chunks(patient_data):
         chunks.append({"text": text, "metadata": metadata, "internal_id": internal_id})
 
     return chunks
+
+
+LAB_VALUE_RE = re.compile(r"^\s*([<>]=?|≤|≥)?\s*(-?\d+(?:[.,]\d+)?)\s*(.*?)\s*$")
+
+
+def normalize_analyte(name):
+    """Canonical analyte key: lowercase, no accents, words joined by '_'."""
+    text = unicodedata.normalize("NFKD", str(name))
+    text = "".join(c for c in text if not unicodedata.combining(c)).lower()
+    return re.sub(r"[^a-z0-9]+", "_", text).strip("_")
+
+
+def parse_lab_value(raw):
+    """
+    Split a lab result like "128 mg/dL", "7.2%" or "<0.5 ng/mL" into
+    (numeric value, unit). Non-numeric results ("Negativo") give (None, "").
+    """
+    if isinstance(raw, (int, float)) and not isinstance(raw, bool):
+        return float(raw), ""
+    match = LAB_VALUE_RE.match(str(raw))
+    # Ratios such as blood pressure ("135/85") are not a single value
+    if not match or re.match(r"/\s*\d", match.group(3)):
+        return None, ""
+    return float(match.group(2).replace(",", ".")), match.group(3)
+
+
+def lab_to_observations(lab):
+    """One row per analyte in a lab's `results` dict, for the lab time-series store."""
+    results = lab.get("results")
+    if not isinstance(results, dict):
+        return []
+
+    observations = []
+    for name, raw in results.items():
+        value, unit = parse_lab_value(raw)
+        observations.append(
+            {
+                "analyte": normalize_analyte(name),
+                "date": lab.get("date"),
+                "value": value,
+                "unit": unit,
+                "raw": str(raw),
+                "test": lab.get("test") or lab.get("test_name") or "",
+            }
+        )
+    return observations
+
+
+def patient_to_lab_observations(patient_data):
+    """All dated lab observations of a patient."""
+    return [
+        observation
+        for lab in patient_data.get("lab_results", [])
+        if lab.get("date")
+        for observation in lab_to_observations(lab)
+    ]
@@ -0,0 +1,155 @@
+import random
+from datetime import date, timedelta
+
+FIRST_NAMES = [
+    "Juan", "María", "José", "Ana", "Luis", "Carmen", "Carlos", "Lucía",
+    "Miguel", "Sofía", "Jorge", "Elena", "Pedro", "Laura", "Andrés", "Paula",
+]
+LAST_NAMES = [
+    "Pérez", "García", "Martínez", "López", "González", "Rodríguez", "Sánchez",
+    "Ramírez", "Torres", "Flores", "Rivera", "Gómez", "Díaz", "Morales",
+]
+DOCTORS = [
+    "Dra. Martínez", "Dr. Gómez", "Dr. Lopez", "Dra. Ruiz", "Dr. Chen",
+    "Dra. Herrera", "Dr. Castillo", "Dra. Vargas",
+]
+BLOOD_TYPES = ["O+", "O-", "A+", "A-", "B+", "B-", "AB+", "AB-"]
+CONDITIONS = [
+    "Diabetes Tipo 2", "Hipertensión", "Asma", "Hipotiroidismo", "Dislipidemia",
+    "EPOC", "Insuficiencia renal crónica", "Fibrilación auricular",
+]
+ALLERGIES = ["Penicilina", "Sulfa", "Dust", "Ibuprofeno", "Látex", "Mariscos"]
+MEDICATIONS = [
+    ("Metformina", "850mg", "2x/día"),
+    ("Losartán", "50mg", "1x/día"),
+    ("Atorvastatina", "20mg", "1x/día"),
+    ("Levotiroxina", "75mcg", "1x/día"),
+    ("Salbutamol", "100mcg", "a demanda"),
+    ("Enalapril", "10mg", "2x/día"),
+]
+VISIT_REASONS = [
+    "Control rutinario", "Consulta por mareos", "Dolor torácico",
+    "Control de diabetes", "Crisis asmática", "Cefalea persistente",
+    "Chequeo anual", "Seguimiento de hipertensión", "Dolor lumbar",
+]
+NOTE_SENTENCES = [
+    "Paciente estable, sin cambios relevantes desde la última consulta.",
+    "Glucosa en ayunas: {glucose} mg/dL.",
+    "PA: {systolic}/{diastolic}.",
+    "Se ajusta dosis de {medication}.",
+    "Se solicitan estudios de laboratorio de control.",
+    "ECG normal.",
+    "Refiere mareos ocasionales al incorporarse.",
+    "Se indica dieta hiposódica y actividad física regular.",
+    "Auscultación pulmonar con sibilancias leves.",
+    "Se refuerza adherencia al tratamiento.",
+    "Control en {weeks} semanas.",
+]
+# Lab panels: test name -> (analyte, unit, low, high, decimals)
+LAB_PANELS = {
+    "Panel metabólico": [
+        ("glucosa", "mg/dL", 75, 190, 0),
+        ("creatinina", "mg/dL", 0.6, 1.8, 1),
+        ("hemoglobina_glicosilada", "%", 5.0, 9.5, 1),
+    ],
+    "Perfil lipídico": [
+        ("colesterol_total", "mg/dL", 140, 280, 0),
+        ("ldl", "mg/dL", 60, 190, 0),
+        ("hdl", "mg/dL", 30, 75, 0),
+    ],
+    "Función tiroidea": [("tsh", "mUI/L", 0.3, 8.0, 2)],
+    "Hemograma": [
+        ("hemoglobina", "g/dL", 10.5, 17.0, 1),
+        ("leucocitos", "10^3/uL", 3.5, 12.0, 1),
+    ],
+    "Spirometry": [("FEV1", "%", 55, 100, 0)],
+}
+
+
+def _event_dates(rng, count, end):
+    """`count` dates in chronological order, roughly every 2-8 weeks back from `end`."""
+    dates = []
+    current = end
+    for _ in range(count):
+        current -= timedelta(days=rng.randint(14, 60))
+        dates.append(current)
+    return [d.isoformat() for d in reversed(dates)]
+
+
+def _note(rng, words, medications):
+    sentences = []
+    length = 0
+    while length < words:
+        sentence = rng.choice(NOTE_SENTENCES).format(
+            glucose=rng.randint(80, 200),
+            systolic=rng.randint(110, 165),
+            diastolic=rng.randint(65, 100),
+            medication=rng.choice(medications)[0] if medications else "tratamiento",
+            weeks=rng.choice([2, 4, 8, 12]),
+        )
+        sentences.append(sentence)
+        length += len(sentence.split())
+    return " ".join(sentences)
+
+
+def synthetic_patient(index, visits=10, labs=10, note_words=20, seed=0, end=None):
+    """
+    A realistic patient in the `data/patient_1.json` schema. Output is fully
+    determined by (index, seed), so a corpus can be regenerated identically.
+    """
+    rng = random.Random(f"{seed}-{index}")
+    end = end or date(2024, 12, 31)
+
+    medications = rng.sample(MEDICATIONS, rng.randint(0, 3))
+    patient = {
+        "patient_id": f"S{index:07d}",
+        "demographics": {
+            "name": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+            "age": rng.randint(18, 95),
+            "gender": rng.choice(["M", "F"]),
+            "blood_type": rng.choice(BLOOD_TYPES),
+        },
+        "medical_history": {
+            "chronic_conditions": rng.sample(CONDITIONS, rng.randint(0, 3)),
+            "allergies": rng.sample(ALLERGIES, rng.randint(0, 2)),
+            "current_medications": [
+                {"name": name, "dose": dose, "frequency": frequency}
+                for name, dose, frequency in medications
+            ],
+        },
+        "recent_visits": [],
+        "lab_results": [],
+    }
+
+    for i, visit_date in enumerate(_event_dates(rng, visits, end)):
+        patient["recent_visits"].append(
+            {
+                "visit_id": f"v{i}",
+                "date": visit_date,
+                "reason": rng.choice(VISIT_REASONS),
+                "notes": _note(rng, note_words, medications),
+                "doctor": rng.choice(DOCTORS),
+            }
+        )
+
+    # Each analyte drifts from a per-patient baseline so trends look plausible
+    baselines = {}
+    for i, lab_date in enumerate(_event_dates(rng, labs, end)):
+        test = rng.choice(list(LAB_PANELS))
+        results = {}
+        for analyte, unit, low, high, decimals in LAB_PANELS[test]:
+            value = baselines.get(analyte, rng.uniform(low, high))
+            value = min(high, max(low, value + rng.gauss(0, (high - low) * 0.05)))
+            baselines[analyte] = value
+            results[analyte] = f"{value:.{decimals}f} {unit}".replace(" %", "%")
+        patient["lab_results"].append(
+            {"lab_id": f"l{i}", "date": lab_date, "test": test, "results": results}
+        )
+
+    return patient
+
+
+def iter_synthetic_patients(count, visits=10, labs=10, note_words=20, seed=0, start=0):
+    """Lazily yield `count` synthetic patients (constant memory for any count)."""
+    for index in range(start, start + count):
+        yield synthetic_patient(index, visits, labs, note_words, seed)